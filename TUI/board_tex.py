@@ -1,9 +1,14 @@
+from textual import work
 from textual.app import App, ComposeResult
 from textual.widgets import Button, Header, Footer, Static
 from textual.containers import Grid, Horizontal
+from textual.worker import get_current_worker
 import chess
 import sys
 
+from explorer import open_index, format_stats
+from machine import MachinePlayer
+
 '''
 WHITE_PIECES = {
     chess.PAWN: "♙",
@@ -134,16 +139,25 @@ class ChessApp(App):
         width: 26;
         content-align: center middle;
     }
+
+    #corpus-stats {
+        width: 24;
+        padding: 1 0;
+    }
     """
 
-    def __init__(self):
+    def __init__(self, level: str | None = None):
         super().__init__()
         self.board = chess.Board()
+        self.machine = MachinePlayer(level) if level else None
+        self.thinking = False
         self.squares: dict[int, Square] = {}
         self.selected_square: int | None = None
         self.blink = True
         self.game_over = False
         self.game_over_reason = ""
+        # Position index for next-move statistics, None if there is none
+        self.index = open_index()
 
     def compose(self) -> ComposeResult:
         yield Header()
@@ -159,9 +173,15 @@ class ChessApp(App):
                         yield btn
 
             yield Static("", id="turn-indicator")
+            yield Static("", id="corpus-stats")
 
         yield Footer()
 
+    def on_unmount(self) -> None:
+        # Closing the window mid-game still returns the engine to the pool.
+        if self.machine:
+            self.machine.close()
+
     def on_mount(self) -> None:
         self.refresh_board()
         self.update_turn_indicator()
@@ -170,6 +190,15 @@ class ChessApp(App):
     def refresh_board(self) -> None:
         for btn in self.squares.values():
             btn.set_piece(self.board)
+        if self.index is not None:
+            self.update_stats(self.board.copy())
+
+    @work(thread=True, exclusive=True, group="stats")
+    def update_stats(self, board: chess.Board) -> None:
+        # The index lookup touches the disk; keep it off the event loop.
+        text = format_stats(self.index, board)
+        if not get_current_worker().is_cancelled:
+            self.call_from_thread(self.query_one("#corpus-stats").update, text)
 
     def update_turn_indicator(self):
         indicator = self.query_one("#turn-indicator")
@@ -189,8 +218,8 @@ class ChessApp(App):
         self.blink = not self.blink
         self.update_turn_indicator()
 
-    async def on_button_pressed(self, event: Button.Pressed) -> None:
-        if self.game_over:
+    def on_button_pressed(self, event: Button.Pressed) -> None:
+        if self.game_over or self.thinking:
             return
 
         square = event.button.square
@@ -213,6 +242,30 @@ class ChessApp(App):
             self.check_game_state()
             self.update_turn_indicator()
 
+            if self.machine and not self.game_over and self.machine.to_move(self.board):
+                # Set before the handler returns, so clicks queued during
+                # the search are dropped instead of played afterwards.
+                self.thinking = True
+                self.machine_move(self.board.copy())
+
+    @work(thread=True, exclusive=True, group="machine")
+    def machine_move(self, board: chess.Board) -> None:
+        # Search off the event loop so the board keeps blinking.
+        reply = None
+        try:
+            reply = self.machine.choose_move(board)
+        finally:
+            self.call_from_thread(self.play_reply, reply)
+
+    def play_reply(self, reply: chess.Move | None) -> None:
+        self.thinking = False
+        if reply is None or self.game_over:
+            return
+        self.board.push(reply)
+        self.refresh_board()
+        self.check_game_state()
+        self.update_turn_indicator()
+
     def clear_selection(self):
         for btn in self.squares.values():
             btn.remove_class("selected")
@@ -232,6 +285,8 @@ class ChessApp(App):
     def end_game(self, reason: str):
         self.game_over = True
         self.game_over_reason = reason
+        if self.machine:
+            self.machine.close()
         self.notify(
             reason,
             severity="error" if "CHECKMATE" in reason else "warning",
@@ -240,5 +295,6 @@ class ChessApp(App):
 
 
 if __name__ == "__main__":
-    ChessApp().run()
+    # python board_tex.py [machine level]
+    ChessApp(level=sys.argv[1] if len(sys.argv) > 1 else None).run()
 
@@ -8,6 +8,7 @@ import subprocess
 import sys
 import os
 
+from engine_pool import start_broker, stop_broker
 from game import main as execute
 from utils import run_in_new_cmd
 
@@ -51,6 +52,15 @@ class TermiChess(App):
         display: none;
         margin-bottom: 2;
     }
+
+    #difficulty-container{
+        display: none;
+        margin-bottom: 2;
+    }
+
+    #difficulty-select {
+        width: 40;
+    }
     
     #style-select {
         width: 40;
@@ -153,11 +163,19 @@ class TermiChess(App):
 
                 with Center():
                     yield Select(
-                        [("against player (local)", "local"), ("against machine (stockfish)", "stockfish")],
+                        [("against player (local)", "local"), ("against machine (built-in engine)", "machine")],
                         prompt="Choose game mode...",
                         id="mode-select"
                     )
 
+                with Vertical(id="difficulty-container"):
+                    with Center():
+                        yield Select(
+                            [('easy', 'easy'), ('medium', 'medium'), ('hard', 'hard')],
+                            prompt='Choose difficulty...',
+                            id="difficulty-select"
+                        )
+
                 with Vertical(id="style-container"):
                     with Center():
                         yield Select(
@@ -187,6 +205,11 @@ class TermiChess(App):
         # Game mode selection
         elif event.select.id == "mode-select":
             self.selected_mode = event.value
+            self.query_one("#difficulty-container").display = event.value == "machine"
+
+        # Difficulty selection
+        elif event.select.id == "difficulty-select":
+            self.difficulty_level = event.value
 
         # Style selection
         elif event.select.id == "style-select":
@@ -210,15 +233,24 @@ class TermiChess(App):
                     run_in_new_cmd('board_tex.py')
 
 
-            elif self.selected_mode == "stockfish":
+            elif self.selected_mode == "machine":
                 if self.difficulty_level:
-                    self.notify(f"Starting game against Stockfish at ELO {self.difficulty_level}!")
-                    # Here you would start the stockfish game with the selected difficulty
+                    self.notify(f"Starting game against the machine ({self.difficulty_level})!")
+                    if self.interface_value == 'text':
+                        run_in_new_cmd('game.py', self.selected_style, 'machine', self.difficulty_level)
+                    else:
+                        run_in_new_cmd('board_tex.py', self.difficulty_level)
                 else:
-                    self.notify("Please select a difficulty level for Stockfish.", severity="error")
+                    self.notify("Please select a difficulty level for the machine.", severity="error")
             else:
                 self.notify("Please select a game mode.", severity="error")
 
 if __name__ == "__main__":
-    app = TermiChess()
-    app.run()
+    # Engines for "against machine" games are kept here, across games,
+    # and lent to each game's process.
+    broker = start_broker()
+    try:
+        app = TermiChess()
+        app.run()
+    finally:
+        stop_broker(broker)
@@ -0,0 +1,389 @@
+"""
+A pool of long-lived UCI engine processes for the "against machine" mode.
+
+Starting an engine and allocating its hash table costs more than a
+short blitz move, so processes are started once and kept: a new game
+borrows an idle one and sends it `ucinewgame` instead of spawning a
+fresh process, and gives it back when the game ends.
+
+Every request has a timeout. A process that misses one, dies, or
+doesn't answer `isready` when it is borrowed is killed and replaced.
+
+Each game runs in a process of its own, so the pools live in a broker
+process the dashboard starts (start_broker) and keeps for its whole
+session. Its address and key reach the game processes through the
+TERMICHESS_BROKER environment variables; get_pool then hands out
+BrokerPool, which borrows engines from the broker and has searches run
+there. A game started without a dashboard gets a pool of its own.
+
+The engine is an external binary (the TERMICHESS_ENGINE environment
+variable, else `stockfish` on PATH) or, when none is installed, the
+bundled uci.py run with this Python.
+"""
+
+import itertools
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import threading
+from multiprocessing.managers import BaseManager
+from typing import Optional
+
+from utils import resource_path
+
+# Seconds allowed for the uci / isready handshakes
+HANDSHAKE_TIMEOUT = 10.0
+# Extra seconds a search may overrun its movetime before it is stopped
+SEARCH_GRACE = 2.0
+
+
+class EngineError(RuntimeError):
+    """The engine process died, misbehaved or missed a timeout."""
+
+
+def engine_command() -> Optional[list]:
+    """Command line of the engine to run, or None if there is none to start."""
+    configured = os.environ.get("TERMICHESS_ENGINE")
+    if configured:
+        return [configured]
+    stockfish = shutil.which("stockfish")
+    if stockfish:
+        return [stockfish]
+    if getattr(sys, "frozen", False):
+        # A PyInstaller build has no Python interpreter to run uci.py with.
+        return None
+    return [sys.executable, resource_path(os.path.join("..", "uci.py"))]
+
+
+class UCIEngine:
+    """One engine subprocess spoken to over UCI."""
+
+    def __init__(self, command: list, options: Optional[dict] = None):
+        self.command = command
+        try:
+            self.process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                text=True, bufsize=1, cwd=os.path.dirname(command[-1]) or None,
+            )
+        except OSError as error:
+            raise EngineError(f"cannot start {command[0]}: {error}") from error
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, daemon=True).start()
+        try:
+            self.send("uci")
+            self.expect("uciok", HANDSHAKE_TIMEOUT)
+            for name, value in (options or {}).items():
+                self.send(f"setoption name {name} value {value}")
+            self.ping()
+        except EngineError:
+            self.close()
+            raise
+
+    def _read(self) -> None:
+        for line in self.process.stdout:
+            self.lines.put(line.strip())
+        self.lines.put(None)  # end of output: the process is gone
+
+    def send(self, line: str) -> None:
+        try:
+            self.process.stdin.write(line + "\n")
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError) as error:
+            raise EngineError(f"engine stopped accepting input: {error}") from error
+
+    def expect(self, prefix: str, timeout: float) -> str:
+        """Read lines until one starts with `prefix` and return it."""
+        while True:
+            try:
+                line = self.lines.get(timeout=timeout)
+            except queue.Empty:
+                raise EngineError(f"no '{prefix}' within {timeout:.1f}s") from None
+            if line is None:
+                raise EngineError("engine process exited")
+            if line.startswith(prefix):
+                return line
+
+    def is_alive(self) -> bool:
+        return self.process.poll() is None
+
+    def ping(self, timeout: float = HANDSHAKE_TIMEOUT) -> None:
+        """Health check: the engine must answer isready."""
+        self.send("isready")
+        self.expect("readyok", timeout)
+
+    def new_game(self) -> None:
+        self.send("ucinewgame")
+        self.ping()
+
+    def best_move(self, fen: str, moves: list, depth: Optional[int] = None,
+                  movetime: Optional[float] = None) -> Optional[str]:
+        """UCI string of the engine's move after `moves` from `fen`, None if it has none."""
+        position = f"position fen {fen}"
+        if moves:
+            position += " moves " + " ".join(moves)
+        self.send(position)
+        go = "go"
+        if depth is not None:
+            go += f" depth {depth}"
+        if movetime is not None:
+            go += f" movetime {int(movetime * 1000)}"
+        self.send(go)
+        limit = (movetime or HANDSHAKE_TIMEOUT) + SEARCH_GRACE
+        try:
+            line = self.expect("bestmove", limit)
+        except EngineError:
+            if not self.is_alive():
+                raise
+            # Overran: ask it to stop and give it one more grace period.
+            self.send("stop")
+            line = self.expect("bestmove", SEARCH_GRACE)
+        move = line.split()[1] if len(line.split()) > 1 else "0000"
+        return None if move in ("0000", "(none)") else move
+
+    def close(self) -> None:
+        if self.is_alive():
+            try:
+                self.send("quit")
+                self.process.wait(timeout=1.0)
+            except (EngineError, subprocess.TimeoutExpired):
+                pass
+        if self.is_alive():
+            self.process.kill()
+            self.process.wait()
+
+
+class EnginePool:
+    """
+    Idle UCIEngine processes, started with the same command and
+    options, handed out one per game.
+    """
+
+    def __init__(self, command: list, options: Optional[dict] = None, size: int = 2):
+        self.command = command
+        self.options = options or {}
+        self.size = size
+        self.idle = []
+        self.busy = set()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> UCIEngine:
+        """A healthy engine set up for a new game; starts one if none is idle."""
+        while True:
+            with self.lock:
+                engine = self.idle.pop() if self.idle else None
+            if engine is None:
+                break
+            try:
+                if not engine.is_alive():
+                    raise EngineError("engine process exited")
+                engine.new_game()
+            except EngineError:
+                engine.close()
+                continue
+            break
+        if engine is None:
+            # A fresh engine has just done its handshake; no need for ucinewgame.
+            engine = UCIEngine(self.command, self.options)
+        with self.lock:
+            self.busy.add(engine)
+        return engine
+
+    def release(self, engine: UCIEngine) -> None:
+        """Give an engine back after a game; broken ones and extras are closed."""
+        with self.lock:
+            self.busy.discard(engine)
+            if engine.is_alive() and len(self.idle) < self.size:
+                self.idle.append(engine)
+                return
+        engine.close()
+
+    def discard(self, engine: UCIEngine) -> None:
+        with self.lock:
+            self.busy.discard(engine)
+        engine.close()
+
+    def close(self) -> None:
+        """Shut down every engine, idle or still lent out."""
+        with self.lock:
+            engines = self.idle + list(self.busy)
+            self.idle, self.busy = [], set()
+        for engine in engines:
+            engine.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _local_pool(threads: int, hash_mb: int) -> Optional[EnginePool]:
+    command = engine_command()
+    if command is None:
+        return None
+    key = (tuple(command), threads, hash_mb)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = EnginePool(command, {"Hash": hash_mb, "Threads": threads})
+        return _pools[key]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+# ---------------- broker ----------------
+
+class _Broker:
+    """Lives in the broker process: lends out engines from its pools, by number."""
+
+    def __init__(self):
+        self.lent = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def acquire(self, threads: int, hash_mb: int) -> int:
+        pool = _local_pool(threads, hash_mb)
+        if pool is None:
+            raise EngineError("no engine to run")
+        engine = pool.acquire()
+        with self.lock:
+            engine_id = next(self.ids)
+            self.lent[engine_id] = (pool, engine)
+        return engine_id
+
+    def best_move(self, engine_id: int, fen: str, moves: list, depth: Optional[int],
+                  movetime: Optional[float]) -> Optional[str]:
+        with self.lock:
+            _, engine = self.lent[engine_id]
+        return engine.best_move(fen, moves, depth, movetime)
+
+    def release(self, engine_id: int) -> None:
+        with self.lock:
+            pool, engine = self.lent.pop(engine_id, (None, None))
+        if pool is not None:
+            pool.release(engine)
+
+    def discard(self, engine_id: int) -> None:
+        with self.lock:
+            pool, engine = self.lent.pop(engine_id, (None, None))
+        if pool is not None:
+            pool.discard(engine)
+
+    def close(self) -> None:
+        with self.lock:
+            self.lent.clear()
+        close_pools()
+
+
+_broker = None
+
+
+def _get_broker() -> _Broker:
+    global _broker
+    if _broker is None:
+        _broker = _Broker()
+    return _broker
+
+
+class EngineBroker(BaseManager):
+    pass
+
+
+EngineBroker.register("broker", callable=_get_broker)
+
+
+def start_broker() -> EngineBroker:
+    """
+    Start the broker process and publish its address in the environment,
+    for the game processes started after this. Stop it with stop_broker.
+    """
+    key = os.urandom(16)
+    manager = EngineBroker(address=("127.0.0.1", 0), authkey=key)
+    manager.start()
+    host, port = manager.address
+    os.environ["TERMICHESS_BROKER"] = f"{host}:{port}"
+    os.environ["TERMICHESS_BROKER_KEY"] = key.hex()
+    return manager
+
+
+def stop_broker(manager: EngineBroker) -> None:
+    try:
+        manager.broker().close()
+    except (OSError, EOFError):
+        pass
+    manager.shutdown()
+    os.environ.pop("TERMICHESS_BROKER", None)
+    os.environ.pop("TERMICHESS_BROKER_KEY", None)
+
+
+class RemoteEngine:
+    """An engine lent by the broker; searches run in the broker process."""
+
+    def __init__(self, broker, engine_id: int):
+        self.broker = broker
+        self.engine_id = engine_id
+
+    def best_move(self, fen: str, moves: list, depth: Optional[int] = None,
+                  movetime: Optional[float] = None) -> Optional[str]:
+        try:
+            return self.broker.best_move(self.engine_id, fen, moves, depth, movetime)
+        except (OSError, EOFError) as error:
+            raise EngineError(f"lost the engine broker: {error}") from error
+
+
+class BrokerPool:
+    """The EnginePool interface over the broker's pools, for one thread count and hash size."""
+
+    def __init__(self, broker, threads: int, hash_mb: int):
+        self.broker = broker
+        self.threads = threads
+        self.hash_mb = hash_mb
+
+    def acquire(self) -> RemoteEngine:
+        try:
+            return RemoteEngine(self.broker, self.broker.acquire(self.threads, self.hash_mb))
+        except (OSError, EOFError) as error:
+            raise EngineError(f"lost the engine broker: {error}") from error
+
+    def release(self, engine: RemoteEngine) -> None:
+        try:
+            self.broker.release(engine.engine_id)
+        except (OSError, EOFError):
+            pass
+
+    def discard(self, engine: RemoteEngine) -> None:
+        try:
+            self.broker.discard(engine.engine_id)
+        except (OSError, EOFError):
+            pass
+
+
+def _connect_broker():
+    """Proxy to the dashboard's broker, or None if there is none to reach."""
+    address = os.environ.get("TERMICHESS_BROKER")
+    key = os.environ.get("TERMICHESS_BROKER_KEY")
+    if not address or not key:
+        return None
+    host, _, port = address.rpartition(":")
+    manager = EngineBroker(address=(host, int(port)), authkey=bytes.fromhex(key))
+    try:
+        manager.connect()
+        return manager.broker()
+    except (OSError, EOFError, ValueError):
+        return None
+
+
+def get_pool(threads: int = 1, hash_mb: int = 16):
+    """
+    The pool for these settings: the broker's when the dashboard runs
+    one, else this process's own. None if there's no engine to run.
+    """
+    broker = _connect_broker()
+    if broker is not None:
+        return BrokerPool(broker, threads, hash_mb)
+    return _local_pool(threads, hash_mb)
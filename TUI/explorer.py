@@ -0,0 +1,61 @@
+"""
+Next-move statistics for the board from a position index built with
+positionindex.py: how many corpus games reached the position and which
+moves were played from it.
+
+The index file is the TERMICHESS_INDEX environment variable, else
+positions.idx at the repo root; without one the boards show nothing.
+"""
+
+import os
+import sys
+from typing import Optional
+
+import chess
+
+from utils import resource_path
+
+# The index and position code live at the repo root.
+sys.path.insert(0, resource_path(".."))
+
+from positionindex import PositionIndex  # noqa: E402
+from temp import Position, move_to_uci  # noqa: E402
+
+
+def open_index() -> Optional[PositionIndex]:
+    path = os.environ.get("TERMICHESS_INDEX") or resource_path(os.path.join("..", "positions.idx"))
+    if not os.path.exists(path):
+        return None
+    try:
+        return PositionIndex(path)
+    except (OSError, ValueError):
+        return None
+
+
+def next_move_stats(index: PositionIndex, board: chess.Board) -> tuple[int, list]:
+    """(games that reached the board, [(SAN, times played), ...] most played first)."""
+    # Only the key is needed, and it doesn't depend on the move history. The
+    # key hashes the e.p. file whenever a pawn attacks the square, legal
+    # capture or not, so the FEN must keep it the same way.
+    pos = Position.from_fen(board.fen(en_passant="fen"))
+    games = index.game_count(pos)
+    moves = []
+    for move, count in index.next_moves(pos):
+        move = chess.Move.from_uci(move_to_uci(move))
+        # A key collision could name a move that isn't legal here.
+        if board.is_legal(move):
+            moves.append((board.san(move), count))
+    return games, moves
+
+
+def format_stats(index: Optional[PositionIndex], board: chess.Board, limit: int = 8) -> str:
+    """Text for the boards' side panel; empty without an index."""
+    if index is None:
+        return ""
+    games, moves = next_move_stats(index, board)
+    if not games:
+        return "Not in the corpus"
+    total = sum(count for _, count in moves) or 1
+    lines = [f"{games} game{'s' if games != 1 else ''}"]
+    lines += [f"{san:7} {count:6} {100 * count / total:3.0f}%" for san, count in moves[:limit]]
+    return "\n".join(lines)
@@ -3,6 +3,7 @@ from typing import Optional
 
 from utils import get_terminal_size, Colors
 from board import print_board
+from machine import MachinePlayer
 import sys
 
 
@@ -23,29 +24,74 @@ def normalize_input(move_str: str) -> str:
     return s
 
 
-def list_legal_moves_by_piece(board: chess.Board, piece_char: str) -> None:
-    piece_map = {
-        "p": chess.PAWN,
-        "n": chess.KNIGHT,
-        "b": chess.BISHOP,
-        "r": chess.ROOK,
-        "q": chess.QUEEN,
-        "k": chess.KING,
-    }
-
+PIECE_MAP = {
+    "p": chess.PAWN,
+    "n": chess.KNIGHT,
+    "b": chess.BISHOP,
+    "r": chess.ROOK,
+    "q": chess.QUEEN,
+    "k": chess.KING,
+}
+
+
+class MoveIndex:
+    """
+    Every legal move of one position under every spelling the input
+    accepts, built once per position so resolving input is a dict lookup:
+
+        exact   SAN, SAN without +/#, UCI, O-O / 0-0 castling, promotion
+                without '=' (e8Q) and the e8q shorthand of normalize_input
+        loose   the same spellings lowercased, for piece letters typed in
+                the wrong case; these can clash (bxc3 vs Bxc3), so they
+                map to a list of moves
+    """
+
+    def __init__(self, board: chess.Board):
+        self.fen = board.fen()
+        self.exact: dict[str, chess.Move] = {}
+        self.loose: dict[str, list] = {}
+        self.by_piece: dict[int, list] = {piece_type: [] for piece_type in PIECE_MAP.values()}
+        self.san: dict[chess.Move, str] = {}
+
+        for move in board.legal_moves:
+            san = board.san(move)
+            self.san[move] = san
+            self.by_piece[board.piece_type_at(move.from_square)].append(move)
+
+            bare = san.rstrip("+#")
+            uci = move.uci()
+            spellings = {san, bare, uci}
+            if bare in ("O-O", "O-O-O"):
+                spellings.add(bare.replace("O", "0"))
+            if move.promotion:
+                spellings.add(bare.replace("=", ""))
+                if "x" not in bare:
+                    spellings.add(uci[2:])  # e8q, as normalize_input reads it
+            for spelling in spellings:
+                self.exact[spelling] = move
+            for spelling in {spelling.lower() for spelling in spellings}:
+                moves = self.loose.setdefault(spelling, [])
+                if move not in moves:
+                    moves.append(move)
+
+    def resolve(self, text: str) -> list:
+        """Moves `text` could mean: one if it is clear, several if ambiguous, none if illegal."""
+        text = text.strip()
+        for spelling in (text, normalize_input(text)):
+            if spelling in self.exact:
+                return [self.exact[spelling]]
+        return list(self.loose.get(text.lower(), ()))
+
+
+def list_legal_moves_by_piece(index: MoveIndex, piece_char: str) -> None:
     piece_char = piece_char.lower()
-    if piece_char not in piece_map:
+    if piece_char not in PIECE_MAP:
         print("Unknown piece. Use p n b r q k")
         return
 
-    piece_type = piece_map[piece_char]
+    piece_type = PIECE_MAP[piece_char]
 
-    moves = [
-        board.san(move)
-        for move in board.legal_moves
-        if board.piece_at(move.from_square)
-        and board.piece_at(move.from_square).piece_type == piece_type
-    ]
+    moves = [index.san[move] for move in index.by_piece[piece_type]]
 
     piece_name = chess.piece_name(piece_type).capitalize()
 
@@ -57,14 +103,41 @@ def list_legal_moves_by_piece(board: chess.Board, piece_char: str) -> None:
         print(f"\n{Colors.ERROR}No legal {piece_name} moves available.{Colors.RESET}")
 
 
-def main(style: str = "simple") -> None:
+def main(style: str = "simple", level: Optional[str] = None) -> None:
+    """
+    Play a game in the terminal. With a `level` ("easy", "medium",
+    "hard") the user plays White against the built-in engine.
+    """
     board = chess.Board()
+    machine = MachinePlayer(level) if level else None
+    try:
+        play(board, style, machine)
+    finally:
+        if machine:
+            # Hand the engine back to the pool however the game ended.
+            machine.close()
+
+
+def play(board: chess.Board, style: str, machine: Optional[MachinePlayer]) -> None:
+    index = None
 
     while not board.is_game_over():
         term_width, _ = get_terminal_size()
         print_board(board, style=style, term_width=term_width)
 
         try:
+            if machine and machine.to_move(board):
+                print(f"\n{Colors.INFO}Machine is thinking...{Colors.RESET}")
+                reply = machine.choose_move(board)
+                san = board.san(reply)
+                board.push(reply)
+                print(f"\n{Colors.SUCCESS}Machine played: {san}{Colors.RESET}")
+                continue
+
+            # Only built on the user's turn: the machine never types a move.
+            if index is None or index.fen != board.fen():
+                index = MoveIndex(board)
+
             raw_input = input("> ").strip()
 
             # Quit (case-insensitive)
@@ -77,40 +150,22 @@ def main(style: str = "simple") -> None:
             # Help command
             if raw_input.lower().startswith("h "):
                 _, piece_char = raw_input.split(maxsplit=1)
-                list_legal_moves_by_piece(board, piece_char)
+                list_legal_moves_by_piece(index, piece_char)
                 continue
 
-            move_str = normalize_input(raw_input)
+            matches = index.resolve(raw_input)
 
             legal_move: Optional[chess.Move] = None
-
-            # 1️⃣ Try UCI
-            try:
-                move = chess.Move.from_uci(move_str.lower())
-                if move in board.legal_moves:
-                    legal_move = move
-            except ValueError:
-                pass
-
-            # 2️⃣ Try SAN (exact, case-sensitive)
-            if not legal_move:
-                san_matches = [
-                    legal
-                    for legal in board.legal_moves
-                    if board.san(legal) == move_str
-                ]
-
-                if len(san_matches) == 1:
-                    legal_move = san_matches[0]
-
-                elif len(san_matches) > 1:
-                    print("\nAmbiguous move. Possible moves:")
-                    for m in san_matches:
-                        print(board.san(m))
-                    continue
+            if len(matches) == 1:
+                legal_move = matches[0]
+            elif len(matches) > 1:
+                print("\nAmbiguous move. Possible moves:")
+                for m in matches:
+                    print(index.san[m])
+                continue
 
             if legal_move:
-                san = board.san(legal_move)
+                san = index.san[legal_move]
                 board.push(legal_move)
                 print(f"\n{Colors.SUCCESS}✓ Legal move: {san}{Colors.RESET}")
             else:
@@ -135,5 +190,7 @@ def main(style: str = "simple") -> None:
 
 
 if __name__ == "__main__":
+    # python game.py [style] [machine level]
     style = sys.argv[1] if len(sys.argv) > 1 else "simple"
-    main(style=style)
+    level = sys.argv[3] if len(sys.argv) > 3 and sys.argv[2] == "machine" else None
+    main(style=style, level=level)
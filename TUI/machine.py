@@ -0,0 +1,96 @@
+import atexit
+import os
+import sys
+from typing import Optional
+
+import chess
+
+from engine_pool import EngineError, get_pool, close_pools
+from utils import resource_path
+
+# The engine modules (temp.py, engine.py, ...) live at the repo root.
+sys.path.insert(0, resource_path(".."))
+
+from engine import Engine  # noqa: E402
+from smp import ParallelEngine  # noqa: E402
+from temp import Position, move_to_uci  # noqa: E402
+
+
+# level -> (max depth, seconds per move, search threads; None = one per CPU)
+DIFFICULTY = {
+    "easy": (2, 0.5, 1),
+    "medium": (4, 1.0, 1),
+    "hard": (64, 3.0, None),
+}
+
+atexit.register(close_pools)
+
+
+def position_from_board(board: chess.Board) -> Position:
+    """
+    Replay the game from its starting position so the engine sees the
+    move history (needed for repetition draws), not just the current FEN.
+    """
+    pos = Position.from_fen(board.root().fen())
+    for move in board.move_stack:
+        pos.make_move(pos.parse_uci(move.uci()))
+    return pos
+
+
+class MachinePlayer:
+    """
+    The computer side of an "against machine" game. Moves come from a
+    UCI engine borrowed from the engine pool for the whole game; if no
+    engine process can be started, the engine searches in this process.
+    """
+
+    def __init__(self, level: str = "medium", color: chess.Color = chess.BLACK):
+        if level not in DIFFICULTY:
+            level = "medium"
+        self.level = level
+        self.color = color
+        self.depth, self.movetime, threads = DIFFICULTY[level]
+        self.threads = threads or os.cpu_count() or 1
+        self.pool = get_pool(self.threads)
+        self.uci = None
+        self.engine = None
+        if self.pool is not None:
+            try:
+                self.uci = self.pool.acquire()
+            except EngineError:
+                self.uci = None
+        if self.uci is None:
+            self._start_local_engine()
+
+    def _start_local_engine(self) -> None:
+        if self.threads == 1:
+            self.engine = Engine()
+        else:
+            self.engine = ParallelEngine(self.threads)
+            atexit.register(self.engine.close)
+
+    def to_move(self, board: chess.Board) -> bool:
+        return board.turn == self.color and not board.is_game_over()
+
+    def choose_move(self, board: chess.Board) -> Optional[chess.Move]:
+        if self.uci is not None:
+            moves = [move.uci() for move in board.move_stack]
+            try:
+                reply = self.uci.best_move(board.root().fen(), moves, self.depth, self.movetime)
+                return chess.Move.from_uci(reply) if reply else None
+            except EngineError:
+                # The process broke mid-game: replace it and carry on with
+                # the in-process engine for the rest of this game.
+                self.pool.discard(self.uci)
+                self.uci = None
+                self._start_local_engine()
+        result = self.engine.search(position_from_board(board), self.depth, self.movetime)
+        if result.move is None:
+            return None
+        return chess.Move.from_uci(move_to_uci(result.move))
+
+    def close(self) -> None:
+        """End of the game: the engine process goes back to the pool."""
+        if self.uci is not None:
+            self.pool.release(self.uci)
+            self.uci = None
@@ -0,0 +1,133 @@
+"""
+Replay and validate PGN archives with the rules the terminal game uses.
+
+Every game is replayed move by move, each SAN token resolved through
+game.MoveIndex exactly as typed input is, and one JSON line is written
+per game:
+
+    {"file": ..., "game": 3, "status": "ok", "plies": 81, "fen": ...}
+    {"file": ..., "game": 4, "status": "illegal", "ply": 17, "move": "Nxe5", "fen": ...}
+
+status is ok, illegal (no legal move matches the token), ambiguous
+(several do) or bad-fen (the FEN tag can't be set up). ply counts from
+1; fen is the final position, or the one the bad move was played in.
+
+Files are read line by line and games handed to worker processes in
+batches, with only a few batches in flight at a time, so memory stays
+the same however large the archive is. Results come out in input order.
+
+>>> python TUI/pgn_check.py archive1.pgn archive2.pgn -o results.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from typing import Iterator
+
+import chess
+
+from game import MoveIndex
+from utils import resource_path
+
+# The PGN reader lives with the game records at the repo root.
+sys.path.insert(0, resource_path(".."))
+
+from gamerecord import read_games, san_tokens  # noqa: E402
+
+# Batches per worker allowed to be queued or running at once
+IN_FLIGHT = 2
+
+
+def _canonical(board: chess.Board, token: str):
+    """
+    The move `token` names if it is that move's own SAN, else None.
+    Nearly every PGN token is, and for those MoveIndex would give the
+    same single answer, so the full index is only built for the rest.
+    """
+    try:
+        move = board.parse_san(token)
+    except ValueError:
+        return None
+    san = board.san(move)
+    return move if token == san or token == san.rstrip("+#") else None
+
+
+def check_game(tags: dict, movetext: str) -> dict:
+    """Replay one game; the result fields of its JSON line."""
+    try:
+        board = chess.Board(tags["FEN"]) if "FEN" in tags else chess.Board()
+    except ValueError:
+        return {"status": "bad-fen", "fen": tags["FEN"]}
+    tokens = san_tokens(movetext)
+    for ply, token in enumerate(tokens, 1):
+        move = _canonical(board, token)
+        matches = [move] if move else MoveIndex(board).resolve(token)
+        if len(matches) != 1:
+            status = "illegal" if not matches else "ambiguous"
+            return {"status": status, "ply": ply, "move": token, "fen": board.fen()}
+        board.push(matches[0])
+    return {"status": "ok", "plies": len(tokens), "fen": board.fen()}
+
+
+def check_batch(batch: list) -> list:
+    """Worker entry: results for a batch of (file, game number, tags, movetext)."""
+    return [{"file": path, "game": number, **check_game(tags, movetext)}
+            for path, number, tags, movetext in batch]
+
+
+def batches(paths: list, size: int) -> Iterator[list]:
+    batch = []
+    for path in paths:
+        for number, (tags, movetext) in enumerate(read_games(path), 1):
+            batch.append((path, number, tags, movetext))
+            if len(batch) == size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay PGN files and report illegal games as JSONL")
+    parser.add_argument("paths", nargs="+", help="PGN files")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=64, help="games per task sent to a worker")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    counts = {}
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(args.workers) as pool:
+            pending = deque()
+
+            def write_oldest() -> None:
+                for result in pending.popleft().get():
+                    out.write(json.dumps(result) + "\n")
+                    counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+            for batch in batches(args.paths, args.batch):
+                pending.append(pool.apply_async(check_batch, (batch,)))
+                if len(pending) >= args.workers * IN_FLIGHT:
+                    write_oldest()
+            while pending:
+                write_oldest()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - start
+    games = sum(counts.values())
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
+    print(f"{games} games in {elapsed:.2f}s ({games / elapsed if elapsed else 0:,.0f} games/s): {summary}",
+          file=sys.stderr)
+    return 0 if counts.get("ok", 0) == games else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
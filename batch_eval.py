@@ -0,0 +1,206 @@
+"""
+Evaluate many positions at once with NumPy.
+
+For offline jobs that score large FEN files: positions are turned into
+arrays once, then every term is computed for all of them together
+instead of one Position at a time.
+
+Layouts (pieces indexed color * 6 + type, squares a1 = 0, exactly as
+parse_fen / temp.Position use them):
+
+    boards      (N, 64) int8, the piece on each square or -1
+    planes      (N, 12, 64) bool, one plane per piece
+    bitboards   (N, 12) uint64, bit `sq` set where the piece stands,
+                the same numbers as Position.pieces
+
+The batch score covers material, piece-square tables and mobility,
+with the weights of evaluate.py, tapered by game phase and given from
+the side to move's point of view. Pawn structure and king safety are
+left to the per-position evaluator.
+
+>>> python batch_eval.py positions.fen > scores.txt
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from evaluate import MOBILITY, TEMPO
+from psqt import PSQT, PHASE_WEIGHTS, PHASE_MAX, mg_eg
+from temp import (
+    PIECE_SYMBOLS, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, FULL, NOT_A, NOT_H, KNIGHT_ATTACKS,
+)
+
+# FEN board characters -> piece index, -1 for an empty square
+_PIECE_LOOKUP = np.full(256, -1, dtype=np.int8)
+for _piece, _symbol in enumerate(PIECE_SYMBOLS):
+    _PIECE_LOOKUP[ord(_symbol)] = _piece
+# Expand the digits of a FEN board to that many empty squares and drop the '/'s
+_EXPAND = str.maketrans({**{str(n): '.' * n for n in range(1, 9)}, '/': None})
+
+# (shift, mask of squares a step may land on) per direction, on uint64 arrays
+_NOT_A = np.uint64(NOT_A)
+_NOT_H = np.uint64(NOT_H)
+_ALL = np.uint64(FULL)
+DIAGONAL_STEPS = ((9, _NOT_A), (7, _NOT_H), (-7, _NOT_A), (-9, _NOT_H))
+STRAIGHT_STEPS = ((8, _ALL), (-8, _ALL), (1, _NOT_A), (-1, _NOT_H))
+SLIDER_STEPS = {BISHOP: DIAGONAL_STEPS, ROOK: STRAIGHT_STEPS, QUEEN: DIAGONAL_STEPS + STRAIGHT_STEPS}
+
+# Indexed by square, plus a 65th all-zero entry for "no piece"
+_KNIGHT_ATTACKS = np.array(KNIGHT_ATTACKS + [0], dtype=np.uint64)
+
+
+def _split_tables():
+    """PSQT as two (13, 64) arrays, row 0 for an empty square, row piece + 1 for a piece."""
+    mg = np.zeros((13, 64), dtype=np.int64)
+    eg = np.zeros((13, 64), dtype=np.int64)
+    for piece in range(12):
+        for sq in range(64):
+            mg[piece + 1, sq], eg[piece + 1, sq] = mg_eg(PSQT[piece][sq])
+    return mg, eg
+
+
+def fens_to_boards(fens) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (boards, side to move) for a list of FENs: boards is (N, 64) int8
+    with the piece index on each square and -1 on empty ones.
+    ValueError on a malformed board.
+    """
+    boards = []
+    sides = np.empty(len(fens), dtype=np.int8)
+    for i, fen in enumerate(fens):
+        fields = fen.split()
+        boards.append(fields[0].translate(_EXPAND))
+        sides[i] = BLACK if len(fields) > 1 and fields[1] == 'b' else WHITE
+    if any(len(board) != 64 for board in boards):
+        raise ValueError("malformed FEN board")
+    squares = np.frombuffer(''.join(boards).encode('ascii'), dtype=np.uint8)
+    # FEN lists rank 8 first; flip the ranks so index 0 is a1.
+    return _PIECE_LOOKUP[squares].reshape(-1, 8, 8)[:, ::-1].reshape(-1, 64), sides
+
+
+def boards_to_planes(boards: np.ndarray) -> np.ndarray:
+    return boards.reshape(-1, 1, 64) == np.arange(12, dtype=np.int8).reshape(1, 12, 1)
+
+
+def planes_to_boards(planes: np.ndarray) -> np.ndarray:
+    return np.where(planes.any(axis=1), planes.argmax(axis=1), -1).astype(np.int8)
+
+
+def planes_to_bitboards(planes: np.ndarray) -> np.ndarray:
+    packed = np.packbits(planes, axis=2, bitorder='little')
+    return np.ascontiguousarray(packed).view('<u8').reshape(planes.shape[0], 12)
+
+
+def bitboards_to_planes(bitboards: np.ndarray) -> np.ndarray:
+    raw = np.ascontiguousarray(bitboards, dtype='<u8').view(np.uint8).reshape(-1, 12, 8)
+    return np.unpackbits(raw, axis=2, bitorder='little').astype(bool)
+
+
+def fens_to_bitboards(fens) -> tuple[np.ndarray, np.ndarray]:
+    boards, sides = fens_to_boards(fens)
+    return planes_to_bitboards(boards_to_planes(boards)), sides
+
+
+def _step(bits: np.ndarray, shift: int, mask: np.uint64) -> np.ndarray:
+    if shift > 0:
+        return (bits << np.uint64(shift)) & mask
+    return (bits >> np.uint64(-shift)) & mask
+
+
+def _slider_attacks(piece: np.ndarray, empty: np.ndarray, steps) -> np.ndarray:
+    attacks = np.zeros_like(piece)
+    for shift, mask in steps:
+        ray = piece
+        for _ in range(7):
+            ray = _step(ray, shift, mask)
+            attacks |= ray
+            ray = ray & empty
+    return attacks
+
+
+def _mobility(bitboards: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(mg, eg) mobility arrays, White minus Black, counted as evaluate.piece_activity does."""
+    occupancy = [np.bitwise_or.reduce(bitboards[:, :6], axis=1),
+                 np.bitwise_or.reduce(bitboards[:, 6:], axis=1)]
+    empty = ~(occupancy[WHITE] | occupancy[BLACK])
+    white_pawns, black_pawns = bitboards[:, PAWN], bitboards[:, 6 + PAWN]
+    pawn_attacks = [_step(white_pawns, 7, _NOT_H) | _step(white_pawns, 9, _NOT_A),
+                    _step(black_pawns, -7, _NOT_A) | _step(black_pawns, -9, _NOT_H)]
+    one = np.uint64(1)
+    mg = np.zeros(len(bitboards), dtype=np.int64)
+    eg = np.zeros(len(bitboards), dtype=np.int64)
+    for color, sign in ((WHITE, 1), (BLACK, -1)):
+        area = ~occupancy[color] & ~pawn_attacks[color ^ 1]
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            weight, neutral = MOBILITY[piece_type]
+            bits = bitboards[:, color * 6 + piece_type].copy()
+            count = np.zeros(len(bitboards), dtype=np.int64)
+            # One piece of this type from every position per pass, so the
+            # loop runs as often as the most such pieces on any board.
+            while bits.any():
+                piece = bits & (~bits + one)
+                bits ^= piece
+                if piece_type == KNIGHT:
+                    attacks = _KNIGHT_ATTACKS[np.bitwise_count(piece - one)]
+                else:
+                    attacks = _slider_attacks(piece, empty, SLIDER_STEPS[piece_type])
+                count += np.where(piece != 0, np.bitwise_count(attacks & area).astype(np.int64) - neutral, 0)
+            weight_mg, weight_eg = mg_eg(weight)
+            mg += sign * weight_mg * count
+            eg += sign * weight_eg * count
+    return mg, eg
+
+
+def evaluate_batch(positions, sides=None) -> np.ndarray:
+    """
+    Scores for a list of FENs, or for an (N, 12) uint64 bitboard array
+    plus an (N,) array of sides to move (all White if omitted).
+    """
+    if isinstance(positions, np.ndarray):
+        bitboards = np.asarray(positions, dtype=np.uint64)
+        boards = planes_to_boards(bitboards_to_planes(bitboards))
+        if sides is None:
+            sides = np.zeros(len(boards), dtype=np.int8)
+    else:
+        boards, sides = fens_to_boards(positions)
+        bitboards = planes_to_bitboards(boards_to_planes(boards))
+    mg_table, eg_table = _split_tables()
+    squares = np.arange(64)
+    mg, eg = _mobility(bitboards)
+    mg += mg_table[boards + 1, squares].sum(axis=1)
+    eg += eg_table[boards + 1, squares].sum(axis=1)
+    counts = np.bitwise_count(bitboards).astype(np.int64)
+    weights = np.array(PHASE_WEIGHTS * 2)
+    phase = np.minimum(counts @ weights, PHASE_MAX)
+    total = mg * phase + eg * (PHASE_MAX - phase)
+    # Truncate toward zero like evaluate.py does.
+    scores = np.sign(total) * (np.abs(total) // PHASE_MAX)
+    scores = np.where(np.asarray(sides) == BLACK, -scores, scores) + TEMPO
+    return scores.astype(np.int32)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Score a file of FENs, one per line")
+    parser.add_argument("path", help="file with one FEN (or EPD line) per line")
+    parser.add_argument("--chunk", type=int, default=100000, help="positions per batch")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    total = 0
+    with open(args.path) as f:
+        fens = [line for line in (line.strip() for line in f) if line]
+    for i in range(0, len(fens), args.chunk):
+        chunk = fens[i:i + args.chunk]
+        scores = evaluate_batch(chunk)
+        sys.stdout.write(''.join(f"{score}\n" for score in scores))
+        total += len(chunk)
+    elapsed = time.perf_counter() - start
+    print(f"{total} positions in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f}/s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Built-in search engine for the "against machine" game mode.
+
+Iterative-deepening negamax with alpha-beta pruning on top of the
+temp.py Position, finished off by a quiescence search over captures
+so leaves are never scored in the middle of an exchange. A search is
+bounded by a depth, a move time and/or a node count; the best move of
+the last completed iteration is returned.
+"""
+
+import math
+import time
+from typing import Callable, NamedTuple, Optional
+
+from evaluate import Evaluator
+from temp import Position, PAWN, KING, move_to_uci
+from tt import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+from ordering import MoveOrdering, is_quiet
+
+INFINITY = 32000
+MATE = 30000
+MAX_PLY = 64
+
+# How many nodes pass between clock checks
+CHECK_EVERY = 1024
+
+ASPIRATION_DEPTH = 4
+ASPIRATION_WINDOW = 50
+NULL_MOVE_DEPTH = 3
+FUTILITY_MARGIN = 200
+LMR_DEPTH = 3
+LMR_MOVES = 3  # moves searched at full depth before reducing
+
+# LMR_TABLE[depth][move number]: plies to reduce a late quiet move by
+LMR_TABLE = [[0] * 64] + [
+    [0] + [int(0.75 + math.log(depth) * math.log(index) / 2.25) for index in range(1, 64)]
+    for depth in range(1, MAX_PLY + 1)
+]
+
+
+def score_to_tt(score: int, ply: int) -> int:
+    # Mate scores are stored relative to the node, not the root.
+    if score >= MATE - MAX_PLY:
+        return score + ply
+    if score <= -MATE + MAX_PLY:
+        return score - ply
+    return score
+
+
+def score_from_tt(score: int, ply: int) -> int:
+    if score >= MATE - MAX_PLY:
+        return score - ply
+    if score <= -MATE + MAX_PLY:
+        return score + ply
+    return score
+
+
+def has_non_pawn_material(pos: Position, color: int) -> bool:
+    pieces = pos.pieces
+    base = color * 6
+    return bool(pos.occupancy[color] ^ pieces[base + PAWN] ^ pieces[base + KING])
+
+
+class SearchResult(NamedTuple):
+    move: Optional[int]
+    score: int
+    depth: int
+    nodes: int
+    seconds: float
+    pv: list
+
+
+class Engine:
+    """
+    Selective search features can be switched off one at a time, e.g.
+    Engine(lmr=False), to measure what each one is worth:
+
+        pvs         principal variation search (null windows after the first move)
+        aspiration  narrow root window around the previous iteration's score
+        null_move   null-move pruning, skipped when only pawns are left
+        lmr         late move reductions for quiet moves searched late
+        futility    skip hopeless quiet moves at frontier nodes
+    """
+
+    def __init__(self, hash_mb: float = 16, pvs: bool = True, aspiration: bool = True,
+                 null_move: bool = True, lmr: bool = True, futility: bool = True,
+                 tt: Optional[TranspositionTable] = None, helper_id: int = 0, stop_event=None,
+                 pawn_hash_kb: float = 256, evaluator=None, new_generation: bool = True,
+                 node_counts=None):
+        # A parallel search passes in a shared table, a helper number
+        # (0 is the main thread) and an event that stops every process.
+        # The owner of a shared table moves its generation on itself and
+        # passes new_generation=False; helpers never do it. Helpers also
+        # publish their node count in node_counts[helper_id] at every
+        # clock check, for the main process to report.
+        self.tt = tt if tt is not None else TranspositionTable(hash_mb)
+        self.helper_id = helper_id
+        self.new_generation = new_generation and not helper_id
+        self.stop_event = stop_event
+        self.node_counts = node_counts
+        self.ordering = MoveOrdering(MAX_PLY, seed=helper_id or None)
+        # Anything with the evaluate.Evaluator interface, e.g. nnue.NNUEEvaluator
+        self.evaluator = evaluator if evaluator is not None else Evaluator(pawn_hash_kb)
+        self.evaluate = self.evaluator.evaluate
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.null_move = null_move
+        self.lmr = lmr
+        self.futility = futility
+        self.nodes = 0
+        self.max_nodes = None
+        self.stopped = False
+        self.deadline = None
+        self.pv_table = [[] for _ in range(MAX_PLY + 1)]
+        self.best_root = None
+
+    def stop(self) -> None:
+        """Ask a running search to return as soon as possible."""
+        self.stopped = True
+
+    def set_movetime(self, movetime: Optional[float]) -> None:
+        """Give a running search a new time limit from now (None for no limit), e.g. on a UCI ponderhit."""
+        self.deadline = time.perf_counter() + movetime if movetime else None
+
+    def search(self, pos: Position, depth: int = MAX_PLY, movetime: Optional[float] = None,
+               on_iteration: Optional[Callable[[SearchResult], None]] = None,
+               nodes: Optional[int] = None) -> SearchResult:
+        """
+        Search `pos` to at most `depth` plies, at most `movetime` seconds
+        and about `nodes` nodes (checked with the clock, every CHECK_EVERY).
+        `on_iteration` is called with the result of every completed depth.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        self.max_nodes = nodes
+        self.stopped = False
+        self.deadline = start + movetime if movetime else None
+        if self.node_counts is not None:
+            self.node_counts[self.helper_id] = 0
+        depth = max(1, min(depth, MAX_PLY))
+        if self.new_generation:
+            self.tt.new_search()
+        self.ordering.new_search()
+        self.evaluator.reset(pos)
+
+        legal = pos.generate_legal_moves()
+        result = SearchResult(legal[0] if legal else None, 0, 0, 0, 0.0, legal[:1])
+        if len(legal) <= 1:
+            return result
+
+        # Odd helpers start one ply deeper so the processes of a parallel
+        # search spread over different depths.
+        for current in range(1 + self.helper_id % 2, depth + 1):
+            self.best_root = result.move
+            score = self._aspiration_search(pos, current, result.score)
+            if self.stopped:
+                break
+            pv = self.pv_table[0][:]
+            result = SearchResult(pv[0], score, current, self.nodes, time.perf_counter() - start, pv)
+            if on_iteration:
+                on_iteration(result)
+            if abs(score) >= MATE - MAX_PLY:
+                break
+            # Another iteration costs several times this one; don't start it
+            # if it cannot finish.
+            if self.deadline and time.perf_counter() + result.seconds > self.deadline:
+                break
+        return result
+
+    def _aspiration_search(self, pos: Position, depth: int, previous: int) -> int:
+        if not self.aspiration or depth < ASPIRATION_DEPTH:
+            return self.negamax(pos, depth, -INFINITY, INFINITY, 0)
+        delta = ASPIRATION_WINDOW
+        alpha = max(previous - delta, -INFINITY)
+        beta = min(previous + delta, INFINITY)
+        while True:
+            score = self.negamax(pos, depth, alpha, beta, 0)
+            if self.stopped:
+                return score
+            if score <= alpha:
+                alpha = max(score - delta, -INFINITY)
+            elif score >= beta:
+                beta = min(score + delta, INFINITY)
+            else:
+                return score
+            delta *= 2
+
+    def _check_time(self) -> None:
+        if self.node_counts is not None:
+            self.node_counts[self.helper_id] = self.nodes
+        if self.deadline and time.perf_counter() >= self.deadline:
+            self.stopped = True
+        elif self.max_nodes and self.nodes >= self.max_nodes:
+            self.stopped = True
+        elif self.stop_event is not None and self.stop_event.is_set():
+            self.stopped = True
+
+    def negamax(self, pos: Position, depth: int, alpha: int, beta: int, ply: int,
+                allow_null: bool = True) -> int:
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self._check_time()
+        if self.stopped:
+            return 0
+        self.pv_table[ply] = []
+
+        if ply and (pos.halfmove >= 100 or pos.is_repetition()):
+            return 0
+        if depth <= 0 or ply >= MAX_PLY:
+            return self.quiescence(pos, alpha, beta, ply)
+
+        pv_node = beta - alpha > 1
+        entry = self.tt.probe(pos.key)
+        hash_move = 0
+        if entry:
+            hash_move = entry.move
+            if ply and entry.depth >= depth:
+                score = score_from_tt(entry.score, ply)
+                if (entry.bound == BOUND_EXACT
+                        or (entry.bound == BOUND_LOWER and score >= beta)
+                        or (entry.bound == BOUND_UPPER and score <= alpha)):
+                    return score
+
+        us = pos.side
+        them = us ^ 1
+        in_check = pos.is_attacked(pos.king[us], them)
+        static_eval = self.evaluate(pos) if not in_check and not pv_node else 0
+
+        # Null move: if passing still holds beta, a real move will too.
+        # Not with only pawns left, where passing may be the best move
+        # there is (zugzwang).
+        if (self.null_move and allow_null and not pv_node and not in_check
+                and depth >= NULL_MOVE_DEPTH and static_eval >= beta
+                and has_non_pawn_material(pos, us)):
+            reduction = 3 if depth > 6 else 2
+            pos.make_null_move()
+            self.evaluator.push(pos)
+            score = -self.negamax(pos, depth - 1 - reduction, -beta, -beta + 1, ply + 1, False)
+            self.evaluator.pop()
+            pos.unmake_null_move()
+            if self.stopped:
+                return 0
+            if score >= beta:
+                return beta if score >= MATE - MAX_PLY else score
+
+        # Futility: at the frontier a quiet move can't lift a hopeless
+        # static evaluation above alpha.
+        prune_quiets = (self.futility and depth == 1 and not pv_node and not in_check
+                        and static_eval + FUTILITY_MARGIN <= alpha)
+
+        original_alpha = alpha
+        best_move = 0
+        if ply == 0 and self.best_root:
+            hash_move = self.best_root
+        legal = 0
+        for move in self.ordering.moves(pos, ply, hash_move):
+            pos.make_move(move)
+            if pos.is_attacked(pos.king[us], them):
+                pos.unmake_move()
+                continue
+            legal += 1
+            quiet = is_quiet(move)
+            gives_check = pos.is_attacked(pos.king[them], us)
+
+            if prune_quiets and quiet and not gives_check and legal > 1:
+                pos.unmake_move()
+                continue
+            self.evaluator.push(pos)
+
+            if legal == 1:
+                score = -self.negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                reduction = 0
+                if (self.lmr and quiet and depth >= LMR_DEPTH and legal > LMR_MOVES
+                        and not in_check and not gives_check):
+                    reduction = LMR_TABLE[min(depth, MAX_PLY)][min(legal, 63)]
+                    if pv_node:
+                        reduction -= 1
+                    reduction = max(0, min(reduction, depth - 2))
+                # With PVS later moves only have to prove they are no
+                # better than alpha (null window); without it they get the
+                # full window. A reduced move that beats alpha is searched
+                # again at full depth either way.
+                low = -alpha - 1 if self.pvs else -beta
+                score = -self.negamax(pos, depth - 1 - reduction, low, -alpha, ply + 1)
+                if reduction and score > alpha:
+                    score = -self.negamax(pos, depth - 1, low, -alpha, ply + 1)
+                if self.pvs and alpha < score < beta:
+                    score = -self.negamax(pos, depth - 1, -beta, -alpha, ply + 1)
+            self.evaluator.pop()
+            pos.unmake_move()
+            if self.stopped:
+                return 0
+            if score > alpha:
+                alpha = score
+                best_move = move
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                if alpha >= beta:
+                    if quiet:
+                        self.ordering.update(move, ply, depth)
+                    break
+
+        if not legal:
+            return -MATE + ply if in_check else 0
+
+        if alpha >= beta:
+            bound = BOUND_LOWER
+        elif alpha > original_alpha:
+            bound = BOUND_EXACT
+        else:
+            bound = BOUND_UPPER
+        self.tt.store(pos.key, best_move, score_to_tt(alpha, ply), depth, bound)
+        return alpha
+
+    def quiescence(self, pos: Position, alpha: int, beta: int, ply: int) -> int:
+        """Resolve captures until the position is quiet, standing pat on the evaluation."""
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self._check_time()
+        if self.stopped:
+            return 0
+        self.pv_table[ply] = []
+
+        stand_pat = self.evaluate(pos)
+        if stand_pat >= beta or ply >= MAX_PLY:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        us = pos.side
+        for move in self.ordering.captures(pos):
+            pos.make_move(move)
+            if pos.is_attacked(pos.king[us], us ^ 1):
+                pos.unmake_move()
+                continue
+            self.evaluator.push(pos)
+            score = -self.quiescence(pos, -beta, -alpha, ply + 1)
+            self.evaluator.pop()
+            pos.unmake_move()
+            if self.stopped:
+                return 0
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                if alpha >= beta:
+                    break
+        return alpha
+
+
+def best_move(fen: str, depth: int = MAX_PLY, movetime: Optional[float] = None) -> Optional[str]:
+    """UCI string of the engine's choice in `fen`, or None if there are no legal moves."""
+    result = Engine().search(Position.from_fen(fen), depth, movetime)
+    return move_to_uci(result.move) if result.move is not None else None
@@ -0,0 +1,237 @@
+"""
+Static evaluation for the search, in centipawns from the side to
+move's point of view.
+
+The base of the score is material plus piece-square tables (psqt.py).
+Position keeps their sum and the game phase up to date in make_move
+and unmake_move, so that part costs nothing here. The terms that need
+to look at the whole board are computed on demand:
+
+    pawn structure  doubled, isolated and passed pawns
+    passed pawns    free path and king distances, from the passed-pawn
+                    bitboard the pawn-structure term also returns
+    mobility        squares each knight, bishop, rook and queen reaches
+    king safety     pawn shield in front of the king, and enemy pieces
+                    attacking the squares around it
+
+All terms are packed S(mg, eg) scores (White minus Black) and are
+blended into one number by the game phase at the end.
+
+The search uses an Evaluator, which caches the pawn-structure term and
+the passed-pawn bitboard in a PawnHashTable keyed by Position.pawn_key;
+evaluate() is the same evaluation without the cache.
+"""
+
+from psqt import S, mg_eg, PHASE_MAX
+from tt import PawnHashTable
+from temp import (
+    Position, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, FILE_A,
+    KNIGHT_ATTACKS, KING_ATTACKS, BISHOP_TABLE, BISHOP_MASKS, ROOK_TABLE, ROOK_MASKS,
+    NOT_A, NOT_H, FULL,
+)
+
+TEMPO = 10
+
+DOUBLED_PAWN = S(-10, -20)
+ISOLATED_PAWN = S(-5, -15)
+# By rank from the pawn's own side, 0 = first rank
+PASSED_PAWN = [S(0, 0), S(5, 10), S(5, 15), S(10, 25), S(20, 45), S(35, 75), S(60, 120), S(0, 0)]
+# Passed pawn whose stop square (the one in front of it) is empty, by rank
+PASSED_FREE = [S(0, 0), S(0, 0), S(2, 4), S(4, 8), S(8, 16), S(12, 28), S(20, 40), S(0, 0)]
+# Endgame weight, by rank, of the enemy king's distance to a passed
+# pawn's stop square (x5) minus the own king's (x2)
+PASSED_KING_DISTANCE = [0, 0, 0, 1, 2, 3, 5, 0]
+
+# (bonus per reachable square, squares for a neutral piece) by piece type
+MOBILITY = {
+    KNIGHT: (S(4, 4), 4),
+    BISHOP: (S(5, 5), 6),
+    ROOK: (S(2, 4), 7),
+    QUEEN: (S(1, 2), 13),
+}
+
+PAWN_SHIELD = S(12, 0)  # per own pawn on the two ranks in front of the king
+KING_ATTACK_WEIGHTS = (0, 2, 2, 3, 5, 0)
+KING_DANGER_LIMIT = 500
+
+FILES = [FILE_A << file for file in range(8)]
+ADJACENT_FILES = [(FILES[file - 1] if file > 0 else 0) | (FILES[file + 1] if file < 7 else 0)
+                  for file in range(8)]
+
+
+def _forward_ranks(color, sq):
+    """All squares on the ranks ahead of `sq` as seen by `color`."""
+    rank = sq >> 3
+    if color == WHITE:
+        return FULL ^ ((1 << ((rank + 1) * 8)) - 1) if rank < 7 else 0
+    return (1 << (rank * 8)) - 1
+
+
+# PASSED_MASKS[color][sq]: squares that must hold no enemy pawn for a
+# pawn on sq to be passed
+PASSED_MASKS = [[_forward_ranks(color, sq) & (FILES[sq & 7] | ADJACENT_FILES[sq & 7])
+                 for sq in range(64)] for color in (WHITE, BLACK)]
+
+
+def _shield_mask(color, sq):
+    file_span = FILES[sq & 7] | ADJACENT_FILES[sq & 7]
+    ahead = _forward_ranks(color, sq)
+    rank = sq >> 3
+    # Only the first two ranks in front of the king
+    if color == WHITE:
+        two_ranks = ahead & ((1 << (min(rank + 3, 8) * 8)) - 1)
+    else:
+        two_ranks = ahead & (FULL ^ ((1 << (max(rank - 2, 0) * 8)) - 1))
+    return file_span & two_ranks
+
+
+SHIELD_MASKS = [[_shield_mask(color, sq) for sq in range(64)] for color in (WHITE, BLACK)]
+
+# King moves between two squares on an empty board
+DISTANCE = [[max(abs((a & 7) - (b & 7)), abs((a >> 3) - (b >> 3))) for b in range(64)] for a in range(64)]
+
+
+def _pawn_attacks(pawns, color):
+    if color == WHITE:
+        return ((pawns & NOT_A) << 7 | (pawns & NOT_H) << 9) & FULL
+    return (pawns & NOT_H) >> 7 | (pawns & NOT_A) >> 9
+
+
+def pawn_structure(pos: Position) -> tuple[int, int]:
+    """Packed pawn-structure score and the bitboard of passed pawns (both colors)."""
+    score = 0
+    passed = 0
+    pieces = pos.pieces
+    for color, sign in ((WHITE, 1), (BLACK, -1)):
+        own = pieces[color * 6 + PAWN]
+        enemy = pieces[(color ^ 1) * 6 + PAWN]
+        masks = PASSED_MASKS[color]
+        for file in range(8):
+            on_file = (own & FILES[file]).bit_count()
+            if on_file > 1:
+                score += sign * DOUBLED_PAWN * (on_file - 1)
+            if on_file and not own & ADJACENT_FILES[file]:
+                score += sign * ISOLATED_PAWN * on_file
+        bits = own
+        while bits:
+            bit = bits & -bits
+            sq = bit.bit_length() - 1
+            bits ^= bit
+            if not enemy & masks[sq]:
+                passed |= bit
+                score += sign * PASSED_PAWN[sq >> 3 if color == WHITE else 7 - (sq >> 3)]
+    return score, passed
+
+
+def passed_pawns(pos: Position, passed: int) -> int:
+    """Packed score for the passed pawns in `passed`, as pawn_structure returns them."""
+    score = 0
+    pieces = pos.pieces
+    occupied = pos.occupied
+    for color, sign in ((WHITE, 1), (BLACK, -1)):
+        own_king = pos.king[color]
+        enemy_king = pos.king[color ^ 1]
+        bits = passed & pieces[color * 6 + PAWN]
+        while bits:
+            bit = bits & -bits
+            sq = bit.bit_length() - 1
+            bits ^= bit
+            if color == WHITE:
+                rank, stop = sq >> 3, sq + 8
+            else:
+                rank, stop = 7 - (sq >> 3), sq - 8
+            if not occupied >> stop & 1:
+                score += sign * PASSED_FREE[rank]
+            distance = 5 * DISTANCE[enemy_king][stop] - 2 * DISTANCE[own_king][stop]
+            score += sign * S(0, PASSED_KING_DISTANCE[rank] * distance)
+    return score
+
+
+def piece_activity(pos: Position) -> int:
+    """Packed mobility and king-safety score."""
+    score = 0
+    pieces = pos.pieces
+    occupied = pos.occupied
+    for color, sign in ((WHITE, 1), (BLACK, -1)):
+        them = color ^ 1
+        base = color * 6
+        # Squares not holding an own piece and not covered by an enemy pawn
+        area = ~pos.occupancy[color] & ~_pawn_attacks(pieces[them * 6 + PAWN], them) & FULL
+        enemy_king = pos.king[them]
+        king_zone = KING_ATTACKS[enemy_king] | (1 << enemy_king)
+        attackers = 0
+        attack_units = 0
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            weight, neutral = MOBILITY[piece_type]
+            bits = pieces[base + piece_type]
+            while bits:
+                bit = bits & -bits
+                sq = bit.bit_length() - 1
+                bits ^= bit
+                if piece_type == KNIGHT:
+                    attacks = KNIGHT_ATTACKS[sq]
+                elif piece_type == BISHOP:
+                    attacks = BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+                elif piece_type == ROOK:
+                    attacks = ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+                else:
+                    attacks = (BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+                               | ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]])
+                score += sign * weight * ((attacks & area).bit_count() - neutral)
+                hits = attacks & king_zone
+                if hits:
+                    attackers += 1
+                    attack_units += KING_ATTACK_WEIGHTS[piece_type] * hits.bit_count()
+        # Pressure on the enemy king; a lone attacker is no real threat.
+        if attackers >= 2:
+            score += sign * S(min(attack_units * attack_units // 2, KING_DANGER_LIMIT), 0)
+
+        king = pos.king[color]
+        shield = (SHIELD_MASKS[color][king] & pieces[base + PAWN]).bit_count()
+        score += sign * PAWN_SHIELD * shield
+    return score
+
+
+def _blend(pos: Position, score: int) -> int:
+    """Taper a packed White-minus-Black score by game phase, for the side to move."""
+    mg, eg = mg_eg(score)
+    phase = min(pos.phase, PHASE_MAX)
+    # Truncate rather than floor so mirrored positions score the same.
+    score = int((mg * phase + eg * (PHASE_MAX - phase)) / PHASE_MAX)
+    return (-score if pos.side == BLACK else score) + TEMPO
+
+
+def evaluate(pos: Position) -> int:
+    pawns, passed = pawn_structure(pos)
+    return _blend(pos, pos.psqt + pawns + passed_pawns(pos, passed) + piece_activity(pos))
+
+
+class Evaluator:
+    """
+    evaluate() with the pawn-structure term cached in a pawn hash table.
+
+    The search calls reset(pos) before it starts, push(pos) after each
+    move it plays and pop() before taking it back. Evaluators that keep
+    state per ply (nnue.NNUEEvaluator) use these; this one doesn't.
+    """
+
+    def __init__(self, pawn_hash_kb: float = 256):
+        self.pawn_table = PawnHashTable(pawn_hash_kb)
+
+    def reset(self, pos: Position) -> None:
+        pass
+
+    def push(self, pos: Position) -> None:
+        pass
+
+    def pop(self) -> None:
+        pass
+
+    def evaluate(self, pos: Position) -> int:
+        entry = self.pawn_table.probe(pos.pawn_key)
+        if entry is None:
+            pawns, passed = pawn_structure(pos)
+            self.pawn_table.store(pos.pawn_key, pawns, passed)
+        else:
+            pawns, passed = entry
+        return _blend(pos, pos.psqt + pawns + passed_pawns(pos, passed) + piece_activity(pos))
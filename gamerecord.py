@@ -0,0 +1,281 @@
+"""
+Compact binary game records.
+
+A game is its start position, result, PGN tags and moves, each move a
+16-bit number in an array('H'): temp.py's own encoding (from | to << 6
+| flags << 12) already fits, so nothing is converted on the way in or
+out and a move is replayed with make_move directly.
+
+File layout, all little-endian:
+
+    magic       b"TCG1"
+    per game    plies (u16), result (u8), FEN length (u8), tags length (u16)
+                FEN, UTF-8, empty for the standard start position
+                tags as a JSON object, UTF-8, without Result / FEN / SetUp
+                one zero byte if needed to reach an even offset
+                plies * u16 moves
+
+GameFile memory-maps a file and reads a game only when it is asked for,
+so opening a multi-million game archive costs one pass over the record
+headers. PGN conversion keeps the main line, tags and result; comments
+and variations are not part of a record.
+
+>>> python gamerecord.py pack games.pgn games.tcg
+>>> python gamerecord.py unpack games.tcg -o games.pgn
+"""
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import time
+from array import array
+from typing import Iterator, NamedTuple, Optional
+
+from temp import Position, WHITE
+
+MAGIC = b"TCG1"
+RECORD = struct.Struct("<HBBH")
+RESULTS = ("*", "1-0", "0-1", "1/2-1/2")
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# Tags that come before Result in PGN export order
+ROSTER = ("Event", "Site", "Date", "Round", "White", "Black")
+LINE_WIDTH = 79
+
+_HEADER = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_COMMENT = re.compile(r'\{[^}]*\}|;[^\n]*')
+_VARIATION = re.compile(r'\([^()]*\)')
+_MOVE_NUMBER = re.compile(r'^\d+\.+')
+_SWAP = sys.byteorder != "little"
+
+
+class Game(NamedTuple):
+    moves: array
+    fen: Optional[str] = None  # None: the standard start position
+    result: str = "*"
+    tags: Optional[dict] = None
+
+    def start(self) -> Position:
+        return Position.from_fen(self.fen or START_FEN)
+
+
+# ---------------- PGN ----------------
+
+def read_games(path: str) -> Iterator[tuple[dict, str]]:
+    """(tags, movetext) for each game in a PGN file, read one line at a time."""
+    tags, movetext = {}, []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                if movetext:
+                    yield tags, "\n".join(movetext)
+                    tags, movetext = {}, []
+                match = _HEADER.match(line)
+                if match:
+                    tags[match.group(1)] = match.group(2)
+            elif line and not line.startswith("%"):
+                movetext.append(line)
+    if tags or movetext:
+        yield tags, "\n".join(movetext)
+
+
+def san_tokens(movetext: str) -> list:
+    """The main-line moves of a movetext: comments, variations, NAGs, numbers and result dropped."""
+    text = _COMMENT.sub(" ", movetext)
+    while True:
+        text, count = _VARIATION.subn(" ", text)
+        if not count:
+            break
+    tokens = []
+    for token in text.split():
+        token = _MOVE_NUMBER.sub("", token).rstrip("!?")
+        if token and token not in RESULTS and not token.startswith("$"):
+            tokens.append(token)
+    return tokens
+
+
+def from_pgn(tags: dict, movetext: str) -> Game:
+    """Game for one PGN game as read_games gives it; ValueError on an illegal move."""
+    tags = dict(tags)
+    result = tags.pop("Result", None)
+    if result is None:
+        # No tag: the result that ends the movetext, if any
+        words = movetext.split()
+        result = words[-1] if words else "*"
+    fen = tags.pop("FEN", None)
+    tags.pop("SetUp", None)
+    pos = Position.from_fen(fen or START_FEN)
+    moves = array("H")
+    for token in san_tokens(movetext):
+        move = pos.parse_san(token)
+        pos.make_move(move)
+        moves.append(move)
+    return Game(moves, fen, result if result in RESULTS else "*", tags)
+
+
+def to_pgn(game: Game) -> str:
+    """PGN text of a game: tags, then the moves wrapped at LINE_WIDTH."""
+    tags = list((game.tags or {}).items())
+    at = 0
+    while at < len(tags) and tags[at][0] in ROSTER:
+        at += 1
+    tags.insert(at, ("Result", game.result))
+    if game.fen:
+        tags += [("SetUp", "1"), ("FEN", game.fen)]
+    lines = [f'[{name} "{value}"]' for name, value in tags]
+
+    pos = game.start()
+    words = []
+    for i, move in enumerate(game.moves):
+        if pos.side == WHITE:
+            words.append(f"{pos.fullmove}.")
+        elif i == 0:
+            words.append(f"{pos.fullmove}...")
+        words.append(pos.san(move))
+        pos.make_move(move)
+    words.append(game.result)
+
+    movetext, line = [], ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > LINE_WIDTH:
+            movetext.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n"
+
+
+# ---------------- binary records ----------------
+
+def encode(game: Game) -> bytes:
+    fen = (game.fen or "").encode("utf-8")
+    tags = json.dumps(game.tags or {}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(game.moves) > 0xFFFF or len(fen) > 0xFF or len(tags) > 0xFFFF:
+        raise ValueError("game too large for a record")
+    head = RECORD.pack(len(game.moves), RESULTS.index(game.result), len(fen), len(tags)) + fen + tags
+    if len(head) % 2:
+        head += b"\0"
+    moves = array("H", game.moves)
+    if _SWAP:
+        moves.byteswap()
+    return head + moves.tobytes()
+
+
+def decode(buffer, offset: int) -> tuple[Game, int]:
+    """The game stored at `offset` and the offset of the next one."""
+    plies, result, fen_length, tags_length = RECORD.unpack_from(buffer, offset)
+    offset += RECORD.size
+    fen = bytes(buffer[offset:offset + fen_length]).decode("utf-8") or None
+    offset += fen_length
+    tags = json.loads(bytes(buffer[offset:offset + tags_length]).decode("utf-8"))
+    offset += tags_length + (fen_length + tags_length) % 2
+    moves = array("H")
+    moves.frombytes(buffer[offset:offset + 2 * plies])
+    if _SWAP:
+        moves.byteswap()
+    return Game(moves, fen, RESULTS[result], tags), offset + 2 * plies
+
+
+def write_games(path: str, games) -> int:
+    """Write an iterable of games to a record file; returns how many."""
+    count = 0
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for game in games:
+            f.write(encode(game))
+            count += 1
+    return count
+
+
+class GameFile:
+    """Random access to the games of a record file through mmap."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        if self.data[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game record file")
+        # Start offset of every game, from one pass over the record headers
+        self.offsets = array("Q")
+        offset = len(MAGIC)
+        while offset < size:
+            self.offsets.append(offset)
+            plies, _, fen_length, tags_length = RECORD.unpack_from(self.data, offset)
+            text = fen_length + tags_length
+            offset += RECORD.size + text + text % 2 + 2 * plies
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> Game:
+        return decode(self.data, self.offsets[index])[0]
+
+    def __iter__(self) -> Iterator[Game]:
+        for offset in self.offsets:
+            yield decode(self.data, offset)[0]
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Convert between PGN and binary game records")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="PGN files -> record file")
+    pack.add_argument("paths", nargs="+", help="PGN files")
+    pack.add_argument("output", help="record file to write")
+    unpack = commands.add_parser("unpack", help="record file -> PGN")
+    unpack.add_argument("path", help="record file")
+    unpack.add_argument("-o", "--output", help="PGN file to write (default: stdout)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "pack":
+        skipped = 0
+
+        def games():
+            nonlocal skipped
+            for path in args.paths:
+                for tags, movetext in read_games(path):
+                    try:
+                        yield from_pgn(tags, movetext)
+                    except ValueError as error:
+                        skipped += 1
+                        print(f"{path}: skipped game: {error}", file=sys.stderr)
+
+        count = write_games(args.output, games())
+        before = sum(os.path.getsize(path) for path in args.paths)
+        after = os.path.getsize(args.output)
+        print(f"{count} games ({skipped} skipped), {before:,} -> {after:,} bytes "
+              f"({before / after:.1f}x) in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    else:
+        out = open(args.output, "w") if args.output else sys.stdout
+        try:
+            with GameFile(args.path) as games:
+                for game in games:
+                    out.write(to_pgn(game) + "\n")
+                count = len(games)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"{count} games in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Optional learned evaluation: a small NNUE-style network in NumPy.
+
+    768 inputs  one per (piece, square), piece = color * 6 + type as in
+                temp.py, 1 where that piece stands
+    hidden      ReLU layer of `hidden` units
+    output      one number, centipawns for White
+
+The first layer is the expensive one, and its inputs barely change
+from move to move: a quiet move turns one feature off and one on. So
+its output (the accumulator) is kept per ply and updated from the
+parent's, adding and subtracting rows of w1, instead of multiplying
+all 768 inputs again. The search drives this through the evaluator
+hooks: reset() at the root, push() after every move it plays, pop()
+when taking it back.
+
+Weights live in a .npz file with arrays w1 (768, hidden), b1 (hidden,),
+w2 (hidden,) and b2 (scalar). `python nnue.py --init net.npz` writes a
+starting network that reproduces the middlegame material + piece-square
+score, for training to start from.
+
+>>> engine = Engine(evaluator=NNUEEvaluator.from_file("net.npz"))
+"""
+
+import argparse
+import sys
+
+import numpy as np
+
+from psqt import PSQT, mg_eg
+from temp import (
+    Position, BLACK, PAWN, ROOK, EMPTY, PROMOTION, EP_CAPTURE, KING_CASTLE, QUEEN_CASTLE,
+)
+
+INPUTS = 768
+DEFAULT_HIDDEN = 128
+
+
+class NNUEEvaluator:
+    """Evaluator with the same interface as evaluate.Evaluator."""
+
+    def __init__(self, w1: np.ndarray, b1: np.ndarray, w2: np.ndarray, b2: float):
+        if w1.shape[0] != INPUTS or w1.shape[1] != b1.shape[0] or w2.shape != b1.shape:
+            raise ValueError(f"bad network shapes: w1 {w1.shape}, b1 {b1.shape}, w2 {w2.shape}")
+        self.w1 = np.ascontiguousarray(w1, dtype=np.float32)
+        self.b1 = np.ascontiguousarray(b1, dtype=np.float32)
+        self.w2 = np.ascontiguousarray(w2, dtype=np.float32)
+        self.b2 = float(b2)
+        self.stack = []
+
+    @classmethod
+    def from_file(cls, path: str) -> "NNUEEvaluator":
+        with np.load(path) as data:
+            return cls(data["w1"], data["b1"], data["w2"], data["b2"])
+
+    def save(self, path: str) -> None:
+        np.savez(path, w1=self.w1, b1=self.b1, w2=self.w2, b2=np.float32(self.b2))
+
+    def refresh(self, pos: Position) -> np.ndarray:
+        """Accumulator computed from scratch."""
+        features = [piece * 64 + sq for sq, piece in enumerate(pos.board) if piece != EMPTY]
+        return self.b1 + self.w1[features].sum(axis=0)
+
+    def reset(self, pos: Position) -> None:
+        self.stack = [self.refresh(pos)]
+
+    def push(self, pos: Position) -> None:
+        """Accumulator for `pos` after the move on top of pos.history."""
+        move, captured = pos.history[-1][:2]
+        if not move:
+            # Null move: same pieces on the same squares.
+            self.stack.append(self.stack[-1])
+            return
+        start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+        board = pos.board
+        piece = board[end]
+        us = piece // 6
+        moved = us * 6 + PAWN if flags & PROMOTION else piece
+        w1 = self.w1
+        acc = self.stack[-1] + w1[piece * 64 + end] - w1[moved * 64 + start]
+        if captured != EMPTY:
+            acc -= w1[captured * 64 + end]
+        elif flags == EP_CAPTURE:
+            victim = end + 8 if us == BLACK else end - 8
+            acc -= w1[((us ^ 1) * 6 + PAWN) * 64 + victim]
+        elif flags == KING_CASTLE or flags == QUEEN_CASTLE:
+            rook = (us * 6 + ROOK) * 64
+            rook_from, rook_to = (start + 3, start + 1) if flags == KING_CASTLE else (start - 4, start - 1)
+            acc += w1[rook + rook_to] - w1[rook + rook_from]
+        self.stack.append(acc)
+
+    def pop(self) -> None:
+        self.stack.pop()
+
+    def evaluate(self, pos: Position) -> int:
+        acc = self.stack[-1] if self.stack else self.refresh(pos)
+        score = int(np.maximum(acc, 0.0) @ self.w2 + self.b2)
+        return -score if pos.side == BLACK else score
+
+
+def psqt_network(hidden: int = DEFAULT_HIDDEN, seed: int = 0) -> NNUEEvaluator:
+    """
+    A network whose output is the middlegame material + PST sum: units
+    0 and 1 carry +sum and -sum through the ReLU (relu(x) - relu(-x) = x),
+    the rest start as small random features that don't reach the output.
+    """
+    if hidden < 2:
+        raise ValueError("need at least 2 hidden units")
+    rng = np.random.default_rng(seed)
+    w1 = rng.normal(0.0, 0.01, (INPUTS, hidden)).astype(np.float32)
+    for piece in range(12):
+        for sq in range(64):
+            mg = mg_eg(PSQT[piece][sq])[0]
+            w1[piece * 64 + sq, 0] = mg
+            w1[piece * 64 + sq, 1] = -mg
+    b1 = np.zeros(hidden, dtype=np.float32)
+    w2 = np.zeros(hidden, dtype=np.float32)
+    w2[0], w2[1] = 1.0, -1.0
+    return NNUEEvaluator(w1, b1, w2, 0.0)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="NNUE weights files")
+    parser.add_argument("--init", metavar="PATH", required=True,
+                        help="write a starting network (material + piece-square tables) to PATH")
+    parser.add_argument("--hidden", type=int, default=DEFAULT_HIDDEN, help="hidden layer size")
+    args = parser.parse_args(argv)
+    psqt_network(args.hidden).save(args.init)
+    print(f"wrote {args.init}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
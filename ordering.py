@@ -0,0 +1,122 @@
+"""
+Move ordering for the alpha-beta search.
+
+Moves come out of MoveOrdering.moves() in stages, and each stage is
+only generated once the previous one failed to cut off:
+
+    1. the hash move (from the transposition table or last iteration)
+    2. captures and promotions that don't lose material (SEE >= 0),
+       best MVV-LVA first
+    3. the two killer moves of this ply
+    4. the remaining quiet moves, highest history score first
+    5. the losing captures
+
+MVV-LVA (most valuable victim, least valuable attacker) tries PxQ
+before QxP. Killers are quiet moves that caused a cutoff at the same
+ply in a sibling node. The history table counts quiet cutoffs by
+from-to square across the whole search.
+"""
+
+import random
+from typing import Iterator, Optional
+
+from temp import Position, CAPTURE, PROMOTION, EP_CAPTURE, EMPTY, PAWN
+
+# Ordering values only; the evaluation has its own piece values.
+VICTIM_VALUES = (1, 3, 3, 5, 9, 0)
+HISTORY_LIMIT = 1 << 20
+
+
+def is_quiet(move: int) -> bool:
+    return not (move >> 12) & (CAPTURE | PROMOTION)
+
+
+def mvv_lva(pos: Position, move: int) -> int:
+    flags = move >> 12
+    attacker = pos.board[move & 63] % 6
+    if flags == EP_CAPTURE:
+        victim = PAWN
+    else:
+        target = pos.board[(move >> 6) & 63]
+        victim = target % 6 if target != EMPTY else None
+    score = VICTIM_VALUES[victim] * 16 - attacker if victim is not None else 0
+    if flags & PROMOTION:
+        # Queen promotions ahead of every capture, under-promotions last.
+        score += 200 if flags & 3 == 3 else -100
+    return score
+
+
+class MoveOrdering:
+    def __init__(self, max_ply: int = 64, seed: Optional[int] = None):
+        self.max_ply = max_ply
+        self.killers = [[0, 0] for _ in range(max_ply + 1)]
+        self.history = [0] * 4096
+        # Parallel search helpers jitter the quiet move order so they
+        # don't all walk the same tree.
+        self.rng = random.Random(seed) if seed is not None else None
+
+    def new_search(self) -> None:
+        """Forget killers and fade the history so old cutoffs count for less."""
+        self.killers = [[0, 0] for _ in range(self.max_ply + 1)]
+        if self.rng:
+            self.history = [(h >> 2) + self.rng.randrange(16) for h in self.history]
+        else:
+            self.history = [h >> 2 for h in self.history]
+
+    def moves(self, pos: Position, ply: int, hash_move: int = 0) -> Iterator[int]:
+        if hash_move and pos.is_pseudo_legal(hash_move):
+            yield hash_move
+        else:
+            hash_move = 0
+
+        losing = []
+        for move in self._sorted_captures(pos):
+            if move == hash_move:
+                continue
+            if pos.see(move) < 0:
+                losing.append(move)
+            else:
+                yield move
+
+        killers = self.killers[ply]
+        for move in killers:
+            if move and move != hash_move and pos.is_pseudo_legal(move) and is_quiet(move):
+                yield move
+
+        history = self.history
+        quiets = pos.generate_quiets()
+        quiets.sort(key=lambda move: history[move & 0xFFF], reverse=True)
+        for move in quiets:
+            if move != hash_move and move not in killers:
+                yield move
+
+        yield from losing
+
+    def captures(self, pos: Position) -> Iterator[int]:
+        """
+        Moves for the quiescence search: captures and queen promotions,
+        best MVV-LVA first. Captures that lose material are skipped.
+        """
+        for move in self._sorted_captures(pos):
+            flags = move >> 12
+            if flags & PROMOTION and flags & 3 != 3:
+                continue
+            if pos.see(move) >= 0:
+                yield move
+
+    @staticmethod
+    def _sorted_captures(pos: Position) -> list:
+        captures = pos.generate_captures()
+        captures.sort(key=lambda move: mvv_lva(pos, move), reverse=True)
+        return captures
+
+    def update(self, move: int, ply: int, depth: int) -> None:
+        """Record a quiet move that caused a beta cutoff."""
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        index = move & 0xFFF
+        self.history[index] += depth * depth
+        if self.history[index] > HISTORY_LIMIT:
+            self.history = [h >> 1 for h in self.history]
@@ -0,0 +1,186 @@
+"""
+Perft: count the leaf nodes of the legal move tree to a fixed depth.
+
+Used to prove the temp.py move generator is correct (node counts must
+match the published reference values) and to track its speed.
+
+>>> python perft.py "<fen>" 4            # total nodes + nodes/second
+>>> python perft.py "<fen>" 3 --divide   # per root move counts
+>>> python perft.py "<fen>" 6 --workers 32 --split 2
+>>> python perft.py --suite              # reference positions
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from temp import Position, move_to_uci
+
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# (name, fen, {depth: nodes}) from the Chess Programming Wiki perft results
+REFERENCE_POSITIONS = [
+    ("start", START_FEN,
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("position3", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("position4", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("position5", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("position6", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890, 4: 3894594}),
+]
+
+
+def _perft(pos: Position, depth: int) -> int:
+    moves = pos.generate_legal_moves()
+    # Bulk counting: the legal moves at depth 1 are the leaves.
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        pos.make_move(move)
+        nodes += _perft(pos, depth - 1)
+        pos.unmake_move()
+    return nodes
+
+
+def _position(fen_or_position) -> Position:
+    if isinstance(fen_or_position, Position):
+        return fen_or_position
+    return Position.from_fen(fen_or_position)
+
+
+def perft(fen_or_position, depth: int) -> int:
+    """Number of leaf nodes `depth` plies below the given FEN or Position."""
+    pos = _position(fen_or_position)
+    if depth <= 0:
+        return 1
+    return _perft(pos, depth)
+
+
+def divide(fen_or_position, depth: int) -> dict[str, int]:
+    """Perft split by root move: {uci move: nodes below it}."""
+    pos = _position(fen_or_position)
+    counts = {}
+    for move in pos.generate_legal_moves():
+        pos.make_move(move)
+        counts[move_to_uci(move)] = _perft(pos, depth - 1) if depth > 1 else 1
+        pos.unmake_move()
+    return counts
+
+
+def _perft_fen(fen: str, depth: int) -> int:
+    return _perft(Position.from_fen(fen), depth) if depth > 0 else 1
+
+
+def parallel_divide(fen_or_position, depth: int, workers: int | None = None,
+                    split_depth: int = 1) -> dict[str, int]:
+    """
+    divide() with the subtrees farmed out to a process pool.
+
+    With split_depth=1 every root move is one task; with split_depth=2
+    every (root move, reply) pair is, which balances better when there
+    are fewer root moves than workers. Counts are summed per root move.
+    """
+    pos = _position(fen_or_position)
+    split_depth = max(1, min(split_depth, 2, depth))
+    counts = {}
+    tasks = []
+    for move in pos.generate_legal_moves():
+        root = move_to_uci(move)
+        counts[root] = 0
+        pos.make_move(move)
+        if split_depth == 1:
+            tasks.append((root, pos.fen(), depth - 1))
+        else:
+            replies = pos.generate_legal_moves()
+            for reply in replies:
+                pos.make_move(reply)
+                tasks.append((root, pos.fen(), depth - 2))
+                pos.unmake_move()
+        pos.unmake_move()
+
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        futures = {pool.submit(_perft_fen, fen, sub_depth): root for root, fen, sub_depth in tasks}
+        for future in as_completed(futures):
+            counts[futures[future]] += future.result()
+    return counts
+
+
+def parallel_perft(fen_or_position, depth: int, workers: int | None = None,
+                   split_depth: int = 1) -> int:
+    if depth <= 0:
+        return 1
+    return sum(parallel_divide(fen_or_position, depth, workers, split_depth).values())
+
+
+def _rate(nodes: int, seconds: float) -> str:
+    return f"{nodes / seconds:,.0f} nps" if seconds > 0 else "- nps"
+
+
+def run_suite(max_depth: int = 3) -> bool:
+    """Check every reference position up to `max_depth`; True if all match."""
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, expected in REFERENCE_POSITIONS:
+        for depth in sorted(expected):
+            if depth > max_depth:
+                break
+            start = time.perf_counter()
+            nodes = perft(fen, depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected[depth] else f"FAIL (expected {expected[depth]})"
+            ok = ok and nodes == expected[depth]
+            print(f"{name:<10} depth {depth}: {nodes:>10} {status:<8} {elapsed:7.2f}s  {_rate(nodes, elapsed)}")
+    print(f"\nTotal: {total_nodes} nodes in {total_time:.2f}s ({_rate(total_nodes, total_time)})")
+    return ok
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Perft for the temp.py move generator")
+    parser.add_argument("fen", nargs="?", default=START_FEN, help="position to count from")
+    parser.add_argument("depth", nargs="?", type=int, default=4)
+    parser.add_argument("--divide", action="store_true", help="print the count below each root move")
+    parser.add_argument("--suite", action="store_true", help="run the reference positions")
+    parser.add_argument("--max-depth", type=int, default=3, help="deepest suite depth to run")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="split the root moves across this many processes (0 = single process)")
+    parser.add_argument("--split", type=int, default=1, choices=(1, 2),
+                        help="plies to expand before handing subtrees to the workers")
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        return 0 if run_suite(args.max_depth) else 1
+
+    start = time.perf_counter()
+    if args.workers and args.depth > 0:
+        counts = parallel_divide(args.fen, args.depth, args.workers, args.split)
+    elif args.divide:
+        counts = divide(args.fen, args.depth)
+    else:
+        counts = None
+
+    if counts is not None:
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        nodes = sum(counts.values())
+        print(f"\nMoves: {len(counts)}")
+    else:
+        nodes = perft(args.fen, args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"Nodes: {nodes}")
+    print(f"Time: {elapsed:.2f}s ({_rate(nodes, elapsed)})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
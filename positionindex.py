@@ -0,0 +1,190 @@
+"""
+Position index over a corpus of game records: which games reached a
+position, at which ply, and what was played next.
+
+The index is a flat file of fixed-width entries, sorted by key:
+
+    key     u64, temp.Position.key (Zobrist) of the position
+    game    u32, number of the game in the record file (GameFile order)
+    ply     u16, moves played before the position
+    move    u16, the move played from it, NO_MOVE where the game ended
+
+Building streams the corpus: entries are collected a chunk at a time,
+each chunk sorted with NumPy and written out as a run, and the runs
+are merged into the final file (an external merge sort), so memory
+stays at one chunk however large the corpus. Queries memory-map the
+file and binary-search it; nothing is read beyond the pages touched.
+
+>>> python positionindex.py build games.tcg games.idx
+>>> python positionindex.py query games.idx "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+"""
+
+import argparse
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from typing import Iterator
+
+import numpy as np
+
+from gamerecord import GameFile
+from temp import Position
+
+ENTRY = struct.Struct("<QIHH")
+ENTRY_DTYPE = np.dtype([("key", "<u8"), ("game", "<u4"), ("ply", "<u2"), ("move", "<u2")])
+# Move 0 (a1 to a1) never occurs, so it marks a game's final position.
+NO_MOVE = 0
+# Entries sorted in memory at once while building (16 bytes each)
+CHUNK_ENTRIES = 1 << 21
+# Entries read from each run at a time while merging
+MERGE_BLOCK = 1 << 14
+
+
+def game_entries(game_id: int, game) -> Iterator[tuple[int, int, int, int]]:
+    """(key, game, ply, next move) for every position of one game, the last one included."""
+    pos = game.start()
+    for ply, move in enumerate(game.moves):
+        yield pos.key, game_id, ply, move
+        pos.make_move(move)
+    yield pos.key, game_id, len(game.moves), NO_MOVE
+
+
+def _write_run(entries: list, directory: str) -> str:
+    run = np.array(entries, dtype=ENTRY_DTYPE)
+    run = run[np.lexsort((run["ply"], run["game"], run["key"]))]
+    fd, path = tempfile.mkstemp(suffix=".run", dir=directory)
+    with os.fdopen(fd, "wb") as f:
+        run.tofile(f)
+    return path
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    run = np.memmap(path, dtype=ENTRY_DTYPE, mode="r") if os.path.getsize(path) else ()
+    for start in range(0, len(run), MERGE_BLOCK):
+        yield from run[start:start + MERGE_BLOCK].tolist()
+
+
+def build_index(corpus: str, output: str, chunk: int = CHUNK_ENTRIES) -> int:
+    """Index every position of a record file into `output`; returns the number of entries."""
+    directory = os.path.dirname(os.path.abspath(output))
+    runs, entries, total = [], [], 0
+    try:
+        with GameFile(corpus) as games:
+            for game_id, game in enumerate(games):
+                entries.extend(game_entries(game_id, game))
+                if len(entries) >= chunk:
+                    runs.append(_write_run(entries, directory))
+                    total += len(entries)
+                    entries = []
+        if entries or not runs:
+            runs.append(_write_run(entries, directory))
+            total += len(entries)
+        if len(runs) == 1:
+            os.replace(runs.pop(), output)
+            return total
+        block = []
+        with open(output, "wb") as f:
+            for entry in heapq.merge(*(_read_run(path) for path in runs)):
+                block.append(entry)
+                if len(block) == MERGE_BLOCK:
+                    np.array(block, dtype=ENTRY_DTYPE).tofile(f)
+                    block = []
+            if block:
+                np.array(block, dtype=ENTRY_DTYPE).tofile(f)
+        return total
+    finally:
+        for path in runs:
+            os.remove(path)
+
+
+class PositionIndex:
+    """Read-only, memory-mapped view of an index file."""
+
+    def __init__(self, path: str):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size % ENTRY.size:
+            self.file.close()
+            raise ValueError(f"{path} is not a position index")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.count = size // ENTRY.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _bound(self, key: int, after: bool) -> int:
+        """Index of the first entry whose key is >= `key` (> `key` if `after`)."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            middle_key = struct.unpack_from("<Q", self.data, middle * ENTRY.size)[0]
+            if middle_key < key or (after and middle_key == key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def entries(self, key: int) -> np.ndarray:
+        """Every occurrence of the position with this key, as a read-only view of the mapped file."""
+        first = self._bound(key, False)
+        end = self._bound(key, True)
+        if first == end:
+            return np.empty(0, dtype=ENTRY_DTYPE)
+        return np.frombuffer(self.data, ENTRY_DTYPE, count=end - first, offset=first * ENTRY.size)
+
+    def game_count(self, pos: Position) -> int:
+        """Number of different games that reached `pos`."""
+        return len(np.unique(self.entries(pos.key)["game"]))
+
+    def next_moves(self, pos: Position) -> list:
+        """(move, times played) for the moves played from `pos`, most played first."""
+        moves, counts = np.unique(self.entries(pos.key)["move"], return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        return [(int(moves[i]), int(counts[i])) for i in order if moves[i] != NO_MOVE]
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Build or query a position index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="game record file -> index file")
+    build.add_argument("corpus", help="record file written by gamerecord.py")
+    build.add_argument("output", help="index file to write")
+    build.add_argument("--chunk", type=int, default=CHUNK_ENTRIES, help="entries sorted in memory at once")
+    query = commands.add_parser("query", help="games and next moves for a FEN")
+    query.add_argument("index", help="index file")
+    query.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.command == "build":
+        total = build_index(args.corpus, args.output, args.chunk)
+        elapsed = time.perf_counter() - start
+        print(f"{total} positions indexed in {elapsed:.2f}s ({total / elapsed if elapsed else 0:,.0f}/s)",
+              file=sys.stderr)
+        return 0
+    pos = Position.from_fen(args.fen)
+    with PositionIndex(args.index) as index:
+        print(f"{index.game_count(pos)} games")
+        for move, count in index.next_moves(pos):
+            print(f"{pos.san(move):8} {count}")
+    print(f"{(time.perf_counter() - start) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
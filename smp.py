@@ -0,0 +1,164 @@
+"""
+Lazy SMP: search one root position with several processes at once.
+
+Every process runs the ordinary engine.Engine search on the same
+position. The only thing they share is a SharedTranspositionTable, so
+what one process learns about a subtree cuts work for the others.
+Helpers differ slightly from the main search (odd helpers start one
+ply deeper, each jitters its quiet move order) so they don't walk the
+same tree in lockstep. When the main search ends, every helper is
+stopped and the deepest completed iteration wins. A node limit applies
+to the main search alone; the node counts reported per iteration and
+returned cover every process.
+
+>>> with ParallelEngine(threads=8, hash_mb=64) as engine:
+...     result = engine.search(pos, movetime=5.0)
+"""
+
+import multiprocessing as mp
+import os
+import queue
+from typing import Callable, Optional
+
+from engine import Engine, SearchResult, MAX_PLY
+from nnue import NNUEEvaluator
+from temp import Position
+from tt import SharedTranspositionTable
+
+# Seconds to wait for a stopped helper to report back
+HELPER_TIMEOUT = 5.0
+
+
+def _game_record(pos: Position) -> tuple[str, list]:
+    """Root FEN and the moves played since, so helpers get the repetition history too."""
+    root = pos.copy()
+    moves = []
+    while root.history:
+        moves.append(root.history[-1][0])
+        root.unmake_move()
+    moves.reverse()
+    return root.fen(), moves
+
+
+def _evaluator(eval_file: Optional[str]):
+    return NNUEEvaluator.from_file(eval_file) if eval_file else None
+
+
+def _helper(helper_id: int, table_name: str, hash_mb: float, eval_file: Optional[str],
+            tasks, results, stop_event, node_counts) -> None:
+    tt = SharedTranspositionTable(hash_mb, table_name)
+    engine = Engine(tt=tt, helper_id=helper_id, stop_event=stop_event, evaluator=_evaluator(eval_file),
+                    node_counts=node_counts)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            search_id, fen, moves, depth, movetime, generation = task
+            pos = Position.from_fen(fen)
+            for move in moves:
+                pos.make_move(move)
+            tt.generation = generation
+            result = engine.search(pos, depth, movetime)
+            results.put((search_id, helper_id, tuple(result)))
+    finally:
+        tt.close()
+
+
+class ParallelEngine:
+    """
+    Drop-in for engine.Engine.search running `threads` processes: the
+    calling process is the main search, threads - 1 helper processes
+    are started once and reused for every search. `eval_file` is an
+    NNUE weights file every process loads instead of the hand-written
+    evaluation.
+    """
+
+    def __init__(self, threads: Optional[int] = None, hash_mb: float = 16, eval_file: Optional[str] = None):
+        self.threads = max(1, threads or os.cpu_count() or 1)
+        self.hash_mb = hash_mb
+        self.tt = SharedTranspositionTable(hash_mb)
+        self.stop_event = mp.Event()
+        # search() moves the table's generation on before the helpers start.
+        self.engine = Engine(tt=self.tt, stop_event=self.stop_event, evaluator=_evaluator(eval_file),
+                             new_generation=False)
+        self.search_id = 0
+        # Nodes searched so far by each helper, by helper id (slot 0 unused)
+        self.node_counts = mp.Array('Q', self.threads, lock=False)
+        self.results = mp.Queue()
+        self.helpers = []
+        for helper_id in range(1, self.threads):
+            tasks = mp.Queue()
+            process = mp.Process(
+                target=_helper,
+                args=(helper_id, self.tt.name, hash_mb, eval_file, tasks, self.results, self.stop_event,
+                      self.node_counts),
+                daemon=True,
+            )
+            process.start()
+            self.helpers.append((process, tasks))
+
+    @property
+    def nodes(self) -> int:
+        return self.engine.nodes + sum(self.node_counts)
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def set_movetime(self, movetime: Optional[float]) -> None:
+        # Helpers have no clock of their own; they stop with the main search.
+        self.engine.set_movetime(movetime)
+
+    def search(self, pos: Position, depth: int = MAX_PLY, movetime: Optional[float] = None,
+               on_iteration: Optional[Callable[[SearchResult], None]] = None,
+               nodes: Optional[int] = None) -> SearchResult:
+        self.stop_event.clear()
+        self.tt.new_search()
+        self.search_id += 1
+        self.node_counts[:] = [0] * self.threads
+        fen, moves = _game_record(pos)
+        for _, tasks in self.helpers:
+            tasks.put((self.search_id, fen, moves, depth, movetime, self.tt.generation))
+
+        def report(result: SearchResult) -> None:
+            on_iteration(result._replace(nodes=result.nodes + sum(self.node_counts)))
+
+        best = self.engine.search(pos, depth, movetime, report if on_iteration else None, nodes)
+        self.stop_event.set()
+
+        # Take a helper's answer only if it finished a deeper iteration.
+        nodes = best.nodes
+        waiting = len(self.helpers)
+        while waiting:
+            try:
+                search_id, _, fields = self.results.get(timeout=HELPER_TIMEOUT)
+            except queue.Empty:
+                break
+            if search_id != self.search_id:
+                continue  # a late answer to an earlier search that timed out
+            waiting -= 1
+            result = SearchResult(*fields)
+            nodes += result.nodes
+            if result.move is not None and result.depth > best.depth:
+                best = result
+        return best._replace(nodes=nodes)
+
+    def close(self) -> None:
+        if self.tt is None:
+            return
+        self.stop_event.set()
+        for process, tasks in self.helpers:
+            tasks.put(None)
+        for process, _ in self.helpers:
+            process.join(timeout=HELPER_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+        self.helpers = []
+        self.tt.close()
+        self.tt = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -1,3 +1,9 @@
+import random
+import re
+
+from psqt import PSQT, PHASE_WEIGHTS
+
+
 def parse_fen(fen):
     parts = fen.split()
     board_part = parts[0]
@@ -16,317 +22,915 @@ def parse_fen(fen):
     en_passant = parts[3] if len(parts) > 3 else '-'
     return board, active_color, castling_rights, en_passant
 
-def is_attacked(pos, board, color):
-    row, col = pos
-    enemy_color = 'b' if color == 'w' else 'w'
-    # Check pawn attacks
-    if color == 'w':
-        if row < 7:
-            if col > 0 and board[row+1][col-1] == 'p':
-                return True
-            if col < 7 and board[row+1][col+1] == 'p':
-                return True
-    else:
-        if row > 0:
-            if col > 0 and board[row-1][col-1] == 'P':
-                return True
-            if col < 7 and board[row-1][col+1] == 'P':
-                return True
-    # Check knight attacks
-    knight_moves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                    (1, -2), (1, 2), (2, -1), (2, 1)]
-    for dr, dc in knight_moves:
-        r = row + dr
-        c = col + dc
-        if 0 <= r < 8 and 0 <= c < 8:
-            piece = board[r][c]
-            if (enemy_color == 'b' and piece == 'n') or (enemy_color == 'w' and piece == 'N'):
-                return True
-    # Check sliding pieces (bishop, rook, queen) and king
-    directions = [(-1, 0), (1, 0), (0, -1), (0, 1),
-                  (-1, -1), (-1, 1), (1, -1), (1, 1)]
-    for dr, dc in directions:
-        r, c = row, col
+
+# ---------------------------------------------------------
+# BITBOARD POSITION
+#
+# Squares are numbered a1 = 0 ... h8 = 63. Pieces are indexed
+# color * 6 + piece type, so 'PNBRQKpnbrqk'[piece] is the FEN
+# letter parse_fen uses for the same piece.
+# ---------------------------------------------------------
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_SYMBOLS = 'PNBRQKpnbrqk'
+EMPTY = -1
+
+FULL = 0xFFFFFFFFFFFFFFFF
+FILE_A = 0x0101010101010101
+FILE_B = FILE_A << 1
+FILE_G = FILE_A << 6
+FILE_H = FILE_A << 7
+NOT_A = FULL ^ FILE_A
+NOT_H = FULL ^ FILE_H
+NOT_AB = FULL ^ (FILE_A | FILE_B)
+NOT_GH = FULL ^ (FILE_G | FILE_H)
+RANK_1 = 0xFF
+RANK_3 = RANK_1 << 16
+RANK_6 = RANK_1 << 40
+RANK_8 = RANK_1 << 56
+
+# Castling rights bits
+WHITE_OO, WHITE_OOO, BLACK_OO, BLACK_OOO = 1, 2, 4, 8
+CASTLING_SYMBOLS = ((WHITE_OO, 'K'), (WHITE_OOO, 'Q'), (BLACK_OO, 'k'), (BLACK_OOO, 'q'))
+
+# Move encoding: from | to << 6 | flags << 12
+QUIET, DOUBLE_PUSH, KING_CASTLE, QUEEN_CASTLE = 0, 1, 2, 3
+CAPTURE, EP_CAPTURE = 4, 5
+PROMOTION = 8  # low two bits hold the promoted piece (KNIGHT - 1 ... QUEEN - 1)
+
+# Piece values for static exchange evaluation
+SEE_VALUES = (100, 320, 330, 500, 900, 20000)
+
+# Rights that survive a move touching each square
+CASTLING_MASK = [0xF] * 64
+CASTLING_MASK[0] = 0xF ^ WHITE_OOO
+CASTLING_MASK[4] = 0xF ^ (WHITE_OO | WHITE_OOO)
+CASTLING_MASK[7] = 0xF ^ WHITE_OO
+CASTLING_MASK[56] = 0xF ^ BLACK_OOO
+CASTLING_MASK[60] = 0xF ^ (BLACK_OO | BLACK_OOO)
+CASTLING_MASK[63] = 0xF ^ BLACK_OO
+
+
+# ---------------------------------------------------------
+# ZOBRIST KEYS
+#
+# Fixed seed so keys are stable across runs and processes. The
+# en-passant file is only hashed when a pawn can actually capture,
+# so a double push nobody can take transposes with a single push.
+# ---------------------------------------------------------
+
+_zobrist_rng = random.Random(0x7E3C)
+ZOBRIST_PIECES = [[_zobrist_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_CASTLING = [_zobrist_rng.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP_FILE = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_SIDE = _zobrist_rng.getrandbits(64)
+ZOBRIST_CASTLING[0] = 0
+
+FILE_NAMES = 'abcdefgh'
+# Piece letter, disambiguating file and rank, destination, promotion piece
+SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+
+
+def square_name(sq):
+    return FILE_NAMES[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name):
+    return (int(name[1]) - 1) * 8 + ord(name[0]) - ord('a')
+
+
+def knight_attacks(bb):
+    l1 = (bb >> 1) & NOT_H
+    l2 = (bb >> 2) & NOT_GH
+    r1 = (bb << 1) & NOT_A
+    r2 = (bb << 2) & NOT_AB
+    h1 = l1 | r1
+    h2 = l2 | r2
+    return ((h1 << 16) | (h1 >> 16) | (h2 << 8) | (h2 >> 8)) & FULL
+
+
+def king_attacks(bb):
+    attacks = ((bb << 1) & NOT_A) | ((bb >> 1) & NOT_H)
+    row = attacks | bb
+    return (attacks | (row << 8) | (row >> 8)) & FULL
+
+
+def pawn_attacks(bb, color):
+    if color == WHITE:
+        return (((bb << 7) & NOT_H) | ((bb << 9) & NOT_A)) & FULL
+    return ((bb >> 9) & NOT_H) | ((bb >> 7) & NOT_A)
+
+# Per color: (right, king home, rook home, squares that must be empty,
+# squares the king may not be attacked on, encoded move)
+CASTLING_MOVES = (
+    ((WHITE_OO, 4, 7, 0x60, (4, 5, 6), 4 | 6 << 6 | KING_CASTLE << 12),
+     (WHITE_OOO, 4, 0, 0x0E, (4, 3, 2), 4 | 2 << 6 | QUEEN_CASTLE << 12)),
+    ((BLACK_OO, 60, 63, 0x60 << 56, (60, 61, 62), 60 | 62 << 6 | KING_CASTLE << 12),
+     (BLACK_OOO, 60, 56, 0x0E << 56, (60, 59, 58), 60 | 58 << 6 | QUEEN_CASTLE << 12)),
+)
+
+
+# ---------------------------------------------------------
+# ATTACK TABLES
+#
+# Built once at import and shared by attack detection, move
+# generation and the castling checks.
+# ---------------------------------------------------------
+
+NORTH, SOUTH, EAST, WEST, NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST = range(8)
+DIRECTION_STEPS = ((8, FULL), (-8, FULL), (1, NOT_A), (-1, NOT_H),
+                   (9, NOT_A), (7, NOT_H), (-7, NOT_A), (-9, NOT_H))
+
+
+def _walk_ray(sq, shift, mask):
+    ray = 0
+    bb = 1 << sq
+    while bb:
+        bb = ((bb << shift) if shift > 0 else (bb >> -shift)) & mask & FULL
+        ray |= bb
+    return ray
+
+
+KNIGHT_ATTACKS = [knight_attacks(1 << sq) for sq in range(64)]
+KING_ATTACKS = [king_attacks(1 << sq) for sq in range(64)]
+PAWN_ATTACKS = [[pawn_attacks(1 << sq, color) for sq in range(64)] for color in (WHITE, BLACK)]
+# RAYS[direction][sq]: every square from `sq` to the board edge, `sq` excluded
+RAYS = [[_walk_ray(sq, shift, mask) for sq in range(64)] for shift, mask in DIRECTION_STEPS]
+
+_N, _S, _E, _W = RAYS[NORTH], RAYS[SOUTH], RAYS[EAST], RAYS[WEST]
+_NE, _NW, _SE, _SW = RAYS[NORTH_EAST], RAYS[NORTH_WEST], RAYS[SOUTH_EAST], RAYS[SOUTH_WEST]
+
+
+def _ray_attacks(sq, occupied, positive, negative):
+    # Rays running towards h8 stop at their lowest blocker, rays running
+    # towards a1 at their highest; the blocker itself stays attacked.
+    attacks = 0
+    for rays in positive:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[(blockers & -blockers).bit_length() - 1]
+        attacks |= ray
+    for rays in negative:
+        ray = rays[sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[blockers.bit_length() - 1]
+        attacks |= ray
+    return attacks
+
+
+# ---------------------------------------------------------
+# SLIDING ATTACK LOOKUP
+#
+# For every square the relevant occupancy (the rays minus their edge
+# squares) is enumerated once, and each subset maps straight to its
+# attack set. At run time a slider's attacks cost one mask and one
+# table lookup: the dict plays the role of the magic multiply/shift
+# (or PEXT) index of a C engine.
+# ---------------------------------------------------------
+
+def _relevant_mask(sq, directions):
+    mask = 0
+    for direction in directions:
+        ray = RAYS[direction][sq]
+        if ray:
+            if direction in (NORTH, EAST, NORTH_EAST, NORTH_WEST):
+                ray ^= 1 << (ray.bit_length() - 1)
+            else:
+                ray ^= ray & -ray
+        mask |= ray
+    return mask
+
+
+def _build_slider_table(directions, positive, negative):
+    masks = []
+    tables = []
+    for sq in range(64):
+        mask = _relevant_mask(sq, directions)
+        table = {}
+        subset = 0
         while True:
-            r += dr
-            c += dc
-            if not (0 <= r < 8 and 0 <= c < 8):
+            table[subset] = _ray_attacks(sq, subset, positive, negative)
+            subset = (subset - mask) & mask
+            if not subset:
                 break
-            piece = board[r][c]
-            if piece == '.':
-                continue
-            if (enemy_color == 'w' and piece.isupper()) or (enemy_color == 'b' and piece.islower()):
-                if (dr == 0 or dc == 0):  # Rook or Queen in straight line
-                    if piece.lower() in ['r', 'q']:
-                        return True
-                else:  # Bishop or Queen in diagonal
-                    if piece.lower() in ['b', 'q']:
-                        return True
-                # King check (distance 1)
-                if piece.lower() == 'k' and abs(r - row) <= 1 and abs(c - col) <= 1:
+        masks.append(mask)
+        tables.append(table)
+    return masks, tables
+
+
+BISHOP_MASKS, BISHOP_TABLE = _build_slider_table(
+    (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST), (_NE, _NW), (_SE, _SW))
+ROOK_MASKS, ROOK_TABLE = _build_slider_table(
+    (NORTH, SOUTH, EAST, WEST), (_N, _E), (_S, _W))
+
+
+def bishop_attacks(sq, occupied):
+    return BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]]
+
+
+def rook_attacks(sq, occupied):
+    return ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]]
+
+
+def queen_attacks(sq, occupied):
+    return bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_flags(move):
+    return move >> 12
+
+
+def move_to_tuple(move):
+    """Convert an encoded move to the ((row, col), (row, col), promo) form."""
+    start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+    promo = 'NBRQ'[flags & 3] if flags & PROMOTION else None
+    return (7 - (start >> 3), start & 7), (7 - (end >> 3), end & 7), promo
+
+
+def move_to_uci(move):
+    flags = move >> 12
+    uci = square_name(move & 63) + square_name((move >> 6) & 63)
+    if flags & PROMOTION:
+        uci += 'nbrq'[flags & 3]
+    return uci
+
+
+class Position:
+    """
+    Bitboard position: one 64-bit integer per piece (color * 6 + type),
+    per-color occupancy masks and a 64-entry mailbox for piece lookup.
+    """
+
+    def __init__(self):
+        self.pieces = [0] * 12
+        self.occupancy = [0, 0]
+        self.occupied = 0
+        self.board = [EMPTY] * 64
+        self.side = WHITE
+        self.castling = 0
+        self.ep = -1
+        self.halfmove = 0
+        self.fullmove = 1
+        self.king = [-1, -1]
+        self.history = []
+        self.key = 0
+        # Running material + piece-square sum (packed mg/eg, White minus
+        # Black) and game phase, kept up to date by make_move.
+        self.psqt = 0
+        self.phase = 0
+        # Zobrist key of the pawns alone, for the evaluation's pawn hash table
+        self.pawn_key = 0
+
+    @classmethod
+    def from_fen(cls, fen):
+        board, active_color, castling_rights, en_passant = parse_fen(fen)
+        parts = fen.split()
+        pos = cls()
+        for row in range(8):
+            for col in range(8):
+                c = board[row][col]
+                if c != '.':
+                    pos._put(PIECE_SYMBOLS.index(c), (7 - row) * 8 + col)
+        pos.side = WHITE if active_color == 'w' else BLACK
+        for bit, symbol in CASTLING_SYMBOLS:
+            if symbol in castling_rights:
+                pos.castling |= bit
+        pos.ep = parse_square(en_passant) if en_passant != '-' else -1
+        pos.halfmove = int(parts[4]) if len(parts) > 4 else 0
+        pos.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        pos.key = pos.compute_key()
+        return pos
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row = ''
+            empty = 0
+            for file in range(8):
+                piece = self.board[rank * 8 + file]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_SYMBOLS[piece]
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        castling = ''.join(symbol for bit, symbol in CASTLING_SYMBOLS if self.castling & bit) or '-'
+        ep = square_name(self.ep) if self.ep != -1 else '-'
+        side = 'w' if self.side == WHITE else 'b'
+        return f"{'/'.join(rows)} {side} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    def copy(self):
+        pos = Position.__new__(Position)
+        pos.pieces = self.pieces[:]
+        pos.occupancy = self.occupancy[:]
+        pos.occupied = self.occupied
+        pos.board = self.board[:]
+        pos.side = self.side
+        pos.castling = self.castling
+        pos.ep = self.ep
+        pos.halfmove = self.halfmove
+        pos.fullmove = self.fullmove
+        pos.king = self.king[:]
+        pos.history = self.history[:]
+        pos.key = self.key
+        pos.psqt = self.psqt
+        pos.phase = self.phase
+        pos.pawn_key = self.pawn_key
+        return pos
+
+    def compute_key(self):
+        """Zobrist key from scratch; make_move keeps self.key equal to this."""
+        key = ZOBRIST_CASTLING[self.castling]
+        for sq, piece in enumerate(self.board):
+            if piece != EMPTY:
+                key ^= ZOBRIST_PIECES[piece][sq]
+        us = self.side
+        if self.ep != -1 and PAWN_ATTACKS[us ^ 1][self.ep] & self.pieces[us * 6 + PAWN]:
+            key ^= ZOBRIST_EP_FILE[self.ep & 7]
+        if us == BLACK:
+            key ^= ZOBRIST_SIDE
+        return key
+
+    def is_repetition(self, count=1):
+        """True if the current position occurred `count` times before since the last irreversible move."""
+        key = self.key
+        history = self.history
+        seen = 0
+        for i in range(len(history) - 2, max(len(history) - self.halfmove, 0) - 1, -2):
+            if history[i][5] == key:
+                seen += 1
+                if seen >= count:
                     return True
-                break
-            else:
-                break
-    return False
-
-def generate_pawn_moves(board, row, col, active_color, en_passant):
-    moves = []
-    if active_color == 'w':
-        direction = -1
-        start_row = 6
-        promotion_row = 0
-    else:
-        direction = 1
-        start_row = 1
-        promotion_row = 7
-    new_row = row + direction
-    if 0 <= new_row < 8:
-        # Forward moves
-        if board[new_row][col] == '.':
-            if new_row == promotion_row:
-                for promo in ['Q', 'R', 'B', 'N']:
-                    moves.append(((row, col), (new_row, col), promo))
-            else:
-                moves.append(((row, col), (new_row, col), None))
-            # Two-square move
-            if row == start_row:
-                new_row2 = row + 2 * direction
-                if board[new_row2][col] == '.':
-                    moves.append(((row, col), (new_row2, col), None))
-        # Captures
-        for dc in [-1, 1]:
-            new_col = col + dc
-            if 0 <= new_col < 8:
-                target = board[new_row][new_col]
-                if target != '.' and ((active_color == 'w' and target.islower()) or (active_color == 'b' and target.isupper())):
-                    if new_row == promotion_row:
-                        for promo in ['Q', 'R', 'B', 'N']:
-                            moves.append(((row, col), (new_row, new_col), promo))
-                    else:
-                        moves.append(((row, col), (new_row, new_col), None))
-                # En passant
-                elif en_passant != '-':
-                    ep_row = 8 - int(en_passant[1])
-                    ep_col = ord(en_passant[0]) - ord('a')
-                    if active_color == 'w' and row == 3 and new_row == ep_row and new_col == ep_col:
-                        moves.append(((row, col), (ep_row, ep_col), None))
-                    elif active_color == 'b' and row == 4 and new_row == ep_row and new_col == ep_col:
-                        moves.append(((row, col), (ep_row, ep_col), None))
-    return moves
-
-def generate_knight_moves(board, row, col, active_color):
-    moves = []
-    knight_moves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2),
-                    (1, -2), (1, 2), (2, -1), (2, 1)]
-    for dr, dc in knight_moves:
-        new_row = row + dr
-        new_col = col + dc
-        if 0 <= new_row < 8 and 0 <= new_col < 8:
-            target = board[new_row][new_col]
-            if target == '.' or (active_color == 'w' and target.islower()) or (active_color == 'b' and target.isupper()):
-                moves.append(((row, col), (new_row, new_col), None))
-    return moves
-
-def generate_slider_moves(board, row, col, active_color, directions):
-    moves = []
-    for dr, dc in directions:
-        new_row, new_col = row, col
+        return False
+
+    def _put(self, piece, sq):
+        bit = 1 << sq
+        self.pieces[piece] |= bit
+        self.occupancy[piece // 6] |= bit
+        self.occupied |= bit
+        self.board[sq] = piece
+        if piece % 6 == KING:
+            self.king[piece // 6] = sq
+        self.psqt += PSQT[piece][sq]
+        self.phase += PHASE_WEIGHTS[piece % 6]
+        if piece % 6 == PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[piece][sq]
+
+    # ---------------- attacks ----------------
+
+    def is_attacked(self, sq, by_color):
+        """True if `by_color` attacks square `sq`."""
+        pieces = self.pieces
+        base = by_color * 6
+        if PAWN_ATTACKS[by_color ^ 1][sq] & pieces[base + PAWN]:
+            return True
+        if KNIGHT_ATTACKS[sq] & pieces[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & pieces[base + KING]:
+            return True
+        queens = pieces[base + QUEEN]
+        occupied = self.occupied
+        diagonal = pieces[base + BISHOP] | queens
+        if diagonal and BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]] & diagonal:
+            return True
+        straight = pieces[base + ROOK] | queens
+        if straight and ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]] & straight:
+            return True
+        return False
+
+    def attackers_to(self, sq, occupied):
+        """Pieces of both colors attacking `sq`, with sliders seeing through to `occupied`."""
+        pieces = self.pieces
+        diagonal = pieces[BISHOP] | pieces[QUEEN] | pieces[6 + BISHOP] | pieces[6 + QUEEN]
+        straight = pieces[ROOK] | pieces[QUEEN] | pieces[6 + ROOK] | pieces[6 + QUEEN]
+        return ((PAWN_ATTACKS[BLACK][sq] & pieces[PAWN])
+                | (PAWN_ATTACKS[WHITE][sq] & pieces[6 + PAWN])
+                | (KNIGHT_ATTACKS[sq] & (pieces[KNIGHT] | pieces[6 + KNIGHT]))
+                | (KING_ATTACKS[sq] & (pieces[KING] | pieces[6 + KING]))
+                | (BISHOP_TABLE[sq][occupied & BISHOP_MASKS[sq]] & diagonal)
+                | (ROOK_TABLE[sq][occupied & ROOK_MASKS[sq]] & straight)) & occupied
+
+    def see(self, move):
+        """
+        Static exchange evaluation: the material balance, in SEE_VALUES,
+        of playing `move` and then letting both sides recapture on the
+        target square with their least valuable attacker for as long as
+        it pays. Negative means the capture loses material.
+        """
+        start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+        pieces = self.pieces
+        occupied = self.occupied ^ (1 << start)
+        attacker = self.board[start] % 6
+        if flags == EP_CAPTURE:
+            gain = [SEE_VALUES[PAWN]]
+            occupied ^= 1 << (end - 8 if self.side == WHITE else end + 8)
+        else:
+            target = self.board[end]
+            gain = [SEE_VALUES[target % 6] if target != EMPTY else 0]
+        if flags & PROMOTION:
+            attacker = KNIGHT + (flags & 3)
+            gain[0] += SEE_VALUES[attacker] - SEE_VALUES[PAWN]
+
+        attackers = self.attackers_to(end, occupied)
+        side = self.side ^ 1
+        on_square = SEE_VALUES[attacker]
         while True:
-            new_row += dr
-            new_col += dc
-            if not (0 <= new_row < 8 and 0 <= new_col < 8):
+            own = attackers & self.occupancy[side]
+            if not own:
                 break
-            target = board[new_row][new_col]
-            if target == '.':
-                moves.append(((row, col), (new_row, new_col), None))
-            else:
-                if (active_color == 'w' and target.islower()) or (active_color == 'b' and target.isupper()):
-                    moves.append(((row, col), (new_row, new_col), None))
-                break
-    return moves
-
-def generate_bishop_moves(board, row, col, active_color):
-    return generate_slider_moves(board, row, col, active_color, [(-1, -1), (-1, 1), (1, -1), (1, 1)])
-
-def generate_rook_moves(board, row, col, active_color):
-    return generate_slider_moves(board, row, col, active_color, [(-1, 0), (1, 0), (0, -1), (0, 1)])
-
-def generate_queen_moves(board, row, col, active_color):
-    return generate_rook_moves(board, row, col, active_color) + generate_bishop_moves(board, row, col, active_color)
-
-def generate_king_moves(board, row, col, active_color, castling_rights):
-    moves = []
-    king_moves = [(-1, -1), (-1, 0), (-1, 1),
-                  (0, -1), (0, 1),
-                  (1, -1), (1, 0), (1, 1)]
-    for dr, dc in king_moves:
-        new_row = row + dr
-        new_col = col + dc
-        if 0 <= new_row < 8 and 0 <= new_col < 8:
-            target = board[new_row][new_col]
-            if target == '.' or (active_color == 'w' and target.islower()) or (active_color == 'b' and target.isupper()):
-                moves.append(((row, col), (new_row, new_col), None))
-    # Castling
-    if active_color == 'w':
-        if 'K' in castling_rights and board[7][5] == '.' and board[7][6] == '.' and board[7][4] == 'K' and board[7][7] == 'R':
-            if not is_attacked((7,4), board, 'w') and not is_attacked((7,5), board, 'w') and not is_attacked((7,6), board, 'w'):
-                moves.append(((7,4), (7,6), None))
-        if 'Q' in castling_rights and board[7][1] == '.' and board[7][2] == '.' and board[7][3] == '.' and board[7][4] == 'K' and board[7][0] == 'R':
-            if not is_attacked((7,4), board, 'w') and not is_attacked((7,3), board, 'w') and not is_attacked((7,2), board, 'w'):
-                moves.append(((7,4), (7,2), None))
-    else:
-        if 'k' in castling_rights and board[0][5] == '.' and board[0][6] == '.' and board[0][4] == 'k' and board[0][7] == 'r':
-            if not is_attacked((0,4), board, 'b') and not is_attacked((0,5), board, 'b') and not is_attacked((0,6), board, 'b'):
-                moves.append(((0,4), (0,6), None))
-        if 'q' in castling_rights and board[0][1] == '.' and board[0][2] == '.' and board[0][3] == '.' and board[0][4] == 'k' and board[0][0] == 'r':
-            if not is_attacked((0,4), board, 'b') and not is_attacked((0,3), board, 'b') and not is_attacked((0,2), board, 'b'):
-                moves.append(((0,4), (0,2), None))
-    return moves
-
-def generate_pseudo_legal_moves(board, active_color, castling_rights, en_passant):
-    moves = []
-    for row in range(8):
-        for col in range(8):
-            piece = board[row][col]
-            if (active_color == 'w' and piece.isupper()) or (active_color == 'b' and piece.islower()):
-                if piece.lower() == 'p':
-                    moves += generate_pawn_moves(board, row, col, active_color, en_passant)
-                elif piece.lower() == 'n':
-                    moves += generate_knight_moves(board, row, col, active_color)
-                elif piece.lower() == 'b':
-                    moves += generate_bishop_moves(board, row, col, active_color)
-                elif piece.lower() == 'r':
-                    moves += generate_rook_moves(board, row, col, active_color)
-                elif piece.lower() == 'q':
-                    moves += generate_queen_moves(board, row, col, active_color)
-                elif piece.lower() == 'k':
-                    moves += generate_king_moves(board, row, col, active_color, castling_rights)
-    return moves
-
-def validate_move(move, board, active_color):
-    temp_board = [row.copy() for row in board]
-    (start_row, start_col), (end_row, end_col), promo = move
-    piece = temp_board[start_row][start_col]
-    # Handle castling
-    if piece.lower() == 'k' and abs(start_col - end_col) == 2:
-        if end_col == 6:  # Kingside
-            rook_col = 7
-            new_rook_col = 5
-        else:  # Queenside
-            rook_col = 0
-            new_rook_col = 3
-        temp_board[start_row][new_rook_col] = temp_board[start_row][rook_col]
-        temp_board[start_row][rook_col] = '.'
-    # Handle en passant
-    elif piece.lower() == 'p' and (end_col != start_col) and temp_board[end_row][end_col] == '.':
-        if active_color == 'w':
-            captured_row = end_row + 1
+            for piece_type in range(6):
+                candidates = own & pieces[side * 6 + piece_type]
+                if candidates:
+                    break
+            gain.append(on_square - gain[-1])
+            occupied ^= candidates & -candidates
+            # Removing the capturer can uncover a slider behind it.
+            attackers = self.attackers_to(end, occupied)
+            on_square = SEE_VALUES[piece_type]
+            side ^= 1
+        for i in range(len(gain) - 1, 0, -1):
+            gain[i - 1] = -max(-gain[i - 1], gain[i])
+        return gain[0]
+
+    def king_square(self, color):
+        return self.king[color]
+
+    def in_check(self):
+        return self.is_attacked(self.king[self.side], self.side ^ 1)
+
+    # ---------------- move generation ----------------
+    #
+    # Every generator takes a `targets` mask of allowed destination
+    # squares: the enemy pieces for captures, the empty squares for
+    # quiet moves, or everything. Pawns split on tactical (captures,
+    # en passant, promotions) and quiet (other pushes) instead.
+
+    def generate_pawn_moves(self, moves, tactical=True, quiet=True):
+        us = self.side
+        pawns = self.pieces[us * 6 + PAWN]
+        empty = ~self.occupied & FULL
+        enemies = self.occupancy[us ^ 1]
+        promotion_rank = RANK_8 | RANK_1
+        if us == WHITE:
+            push = (pawns << 8) & empty
+            double = ((push & RANK_3) << 8) & empty
+            captures = ((((pawns << 7) & NOT_H) & enemies, -7), (((pawns << 9) & NOT_A) & enemies, -9))
+            back = -8
         else:
-            captured_row = end_row - 1
-        temp_board[captured_row][end_col] = '.'
-    # Update the board
-    temp_board[end_row][end_col] = piece
-    temp_board[start_row][start_col] = '.'
-    if promo:
-        temp_board[end_row][end_col] = promo if active_color == 'w' else promo.lower()
-    # Find the king's position
-    king_pos = None
-    for r in range(8):
-        for c in range(8):
-            p = temp_board[r][c]
-            if p.lower() == 'k' and ((active_color == 'w' and p == 'K') or (active_color == 'b' and p == 'k')):
-                king_pos = (r, c)
-                break
-        if king_pos:
-            break
-    # Check if the king is attacked
-    return not is_attacked(king_pos, temp_board, active_color)
+            push = (pawns >> 8) & empty
+            double = ((push & RANK_6) >> 8) & empty
+            captures = ((((pawns >> 9) & NOT_H) & enemies, 9), (((pawns >> 7) & NOT_A) & enemies, 7))
+            back = 8
+        targets = []
+        if tactical:
+            targets.append((push & promotion_rank, back, QUIET))
+            targets.append((captures[0][0], captures[0][1], CAPTURE))
+            targets.append((captures[1][0], captures[1][1], CAPTURE))
+        if quiet:
+            targets.append((push & ~promotion_rank, back, QUIET))
+            targets.append((double, 2 * back, DOUBLE_PUSH))
+        for bb, back, flag in targets:
+            while bb:
+                bit = bb & -bb
+                bb ^= bit
+                to = bit.bit_length() - 1
+                move = (to + back) | (to << 6)
+                if bit & promotion_rank:
+                    for promo in (3, 2, 1, 0):
+                        moves.append(move | ((flag | PROMOTION | promo) << 12))
+                else:
+                    moves.append(move | (flag << 12))
+        if tactical and self.ep != -1:
+            attackers = PAWN_ATTACKS[us ^ 1][self.ep] & pawns
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                moves.append((bit.bit_length() - 1) | (self.ep << 6) | (EP_CAPTURE << 12))
 
-def generate_legal_moves(fen):
-    board, active_color, castling_rights, en_passant = parse_fen(fen)
-    pseudo_legal = generate_pseudo_legal_moves(board, active_color, castling_rights, en_passant)
-    legal_moves = []
-    for move in pseudo_legal:
-        if validate_move(move, board, active_color):
-            legal_moves.append(move)
-    return legal_moves
-
-def move_to_san(move, board, active_color):
-    (start_row, start_col), (end_row, end_col), promo = move
-    piece = board[start_row][start_col]
-    # Castling
-    if piece.lower() == 'k' and abs(start_col - end_col) == 2:
-        return 'O-O' if end_col == 6 else 'O-O-O'
-    # Pawn moves
-    san = ''
-    piece_type = piece.upper()
-    if piece.lower() == 'p':
-        capture = board[end_row][end_col] != '.' or (start_col != end_col and board[end_row][end_col] == '.' and en_passant != '-')
-        if capture:
-            san = f"{chr(start_col + ord('a'))}x{chr(end_col + ord('a'))}{8 - end_row}"
+    def _add_moves(self, moves, start, targets):
+        enemies = self.occupancy[self.side ^ 1]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            flag = CAPTURE << 12 if bit & enemies else 0
+            moves.append(start | ((bit.bit_length() - 1) << 6) | flag)
+
+    def generate_knight_moves(self, moves, targets=FULL):
+        targets &= ~self.occupancy[self.side]
+        knights = self.pieces[self.side * 6 + KNIGHT]
+        while knights:
+            bit = knights & -knights
+            knights ^= bit
+            sq = bit.bit_length() - 1
+            self._add_moves(moves, sq, KNIGHT_ATTACKS[sq] & targets)
+
+    def generate_slider_moves(self, moves, piece_type, attacks, targets=FULL):
+        targets &= ~self.occupancy[self.side]
+        sliders = self.pieces[self.side * 6 + piece_type]
+        while sliders:
+            bit = sliders & -sliders
+            sliders ^= bit
+            sq = bit.bit_length() - 1
+            self._add_moves(moves, sq, attacks(sq, self.occupied) & targets)
+
+    def generate_bishop_moves(self, moves, targets=FULL):
+        self.generate_slider_moves(moves, BISHOP, bishop_attacks, targets)
+
+    def generate_rook_moves(self, moves, targets=FULL):
+        self.generate_slider_moves(moves, ROOK, rook_attacks, targets)
+
+    def generate_queen_moves(self, moves, targets=FULL):
+        self.generate_slider_moves(moves, QUEEN, queen_attacks, targets)
+
+    def generate_king_moves(self, moves, targets=FULL, castling=True):
+        us = self.side
+        king = self.pieces[us * 6 + KING]
+        if not king:
+            return
+        sq = king.bit_length() - 1
+        self._add_moves(moves, sq, KING_ATTACKS[sq] & targets & ~self.occupancy[us])
+        # Castling: the king and rook must be home, the path empty and the
+        # king's start, transit and destination squares unattacked.
+        if not castling or not self.castling & (3 << 2 * us):
+            return
+        them = us ^ 1
+        rooks = self.pieces[us * 6 + ROOK]
+        for right, home, rook, path, transit, move in CASTLING_MOVES[us]:
+            if (self.castling & right and sq == home and rooks >> rook & 1
+                    and not self.occupied & path
+                    and not any(self.is_attacked(t, them) for t in transit)):
+                moves.append(move)
+
+    def generate_pseudo_legal_moves(self):
+        moves = []
+        self.generate_pawn_moves(moves)
+        self.generate_knight_moves(moves)
+        self.generate_bishop_moves(moves)
+        self.generate_rook_moves(moves)
+        self.generate_queen_moves(moves)
+        self.generate_king_moves(moves)
+        return moves
+
+    def generate_captures(self):
+        """Captures, en passant and promotions (the tactical moves)."""
+        moves = []
+        enemies = self.occupancy[self.side ^ 1]
+        self.generate_pawn_moves(moves, quiet=False)
+        self.generate_knight_moves(moves, enemies)
+        self.generate_bishop_moves(moves, enemies)
+        self.generate_rook_moves(moves, enemies)
+        self.generate_queen_moves(moves, enemies)
+        self.generate_king_moves(moves, enemies, castling=False)
+        return moves
+
+    def generate_quiets(self):
+        """Every pseudo-legal move generate_captures leaves out."""
+        moves = []
+        empty = ~self.occupied & FULL
+        self.generate_pawn_moves(moves, tactical=False)
+        self.generate_knight_moves(moves, empty)
+        self.generate_bishop_moves(moves, empty)
+        self.generate_rook_moves(moves, empty)
+        self.generate_queen_moves(moves, empty)
+        self.generate_king_moves(moves, empty)
+        return moves
+
+    def is_pseudo_legal(self, move):
+        """True if `move` (e.g. from a hash table) can be played here, ignoring checks."""
+        start = move & 63
+        piece = self.board[start]
+        if piece == EMPTY or piece // 6 != self.side:
+            return False
+        piece_type = piece % 6
+        moves = []
+        if piece_type == PAWN:
+            self.generate_pawn_moves(moves)
+        elif piece_type == KNIGHT:
+            self.generate_knight_moves(moves)
+        elif piece_type == BISHOP:
+            self.generate_bishop_moves(moves)
+        elif piece_type == ROOK:
+            self.generate_rook_moves(moves)
+        elif piece_type == QUEEN:
+            self.generate_queen_moves(moves)
         else:
-            san = f"{chr(end_col + ord('a'))}{8 - end_row}"
-        if promo:
-            san += f'={promo.upper()}'
+            self.generate_king_moves(moves)
+        return move in moves
+
+    # ---------------- making moves ----------------
+
+    def make_move(self, move):
+        """
+        Play an encoded move in place, updating the Zobrist keys and the
+        piece-square sum as it goes. The undo record (move, captured piece,
+        castling rights, en-passant square, halfmove clock, key, psqt,
+        phase, pawn key) goes on self.history for unmake_move.
+        """
+        start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+        us = self.side
+        them = us ^ 1
+        board = self.board
+        pieces = self.pieces
+        occupancy = self.occupancy
+        moved = piece = board[start]
+        captured = board[end]
+        key = self.key
+        psqt = self.psqt
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove, key, psqt, self.phase,
+                             self.pawn_key))
+        start_bit = 1 << start
+        end_bit = 1 << end
+
+        if self.ep != -1 and PAWN_ATTACKS[them][self.ep] & pieces[us * 6 + PAWN]:
+            key ^= ZOBRIST_EP_FILE[self.ep & 7]
+        if captured != EMPTY:
+            pieces[captured] ^= end_bit
+            occupancy[them] ^= end_bit
+            key ^= ZOBRIST_PIECES[captured][end]
+            psqt -= PSQT[captured][end]
+            self.phase -= PHASE_WEIGHTS[captured % 6]
+            if captured % 6 == PAWN:
+                self.pawn_key ^= ZOBRIST_PIECES[captured][end]
+        elif flags == EP_CAPTURE:
+            victim = end - 8 if us == WHITE else end + 8
+            victim_bit = 1 << victim
+            pieces[them * 6 + PAWN] ^= victim_bit
+            occupancy[them] ^= victim_bit
+            self.occupied ^= victim_bit
+            board[victim] = EMPTY
+            key ^= ZOBRIST_PIECES[them * 6 + PAWN][victim]
+            psqt -= PSQT[them * 6 + PAWN][victim]
+            self.pawn_key ^= ZOBRIST_PIECES[them * 6 + PAWN][victim]
+
+        pieces[piece] ^= start_bit
+        if flags & PROMOTION:
+            piece = us * 6 + KNIGHT + (flags & 3)
+            self.phase += PHASE_WEIGHTS[piece % 6]
+        pieces[piece] |= end_bit
+        key ^= ZOBRIST_PIECES[moved][start] ^ ZOBRIST_PIECES[piece][end]
+        psqt += PSQT[piece][end] - PSQT[moved][start]
+        if moved == us * 6 + PAWN:
+            self.pawn_key ^= ZOBRIST_PIECES[moved][start]
+            if piece == moved:
+                self.pawn_key ^= ZOBRIST_PIECES[piece][end]
+        board[end] = piece
+        board[start] = EMPTY
+        occupancy[us] ^= start_bit | end_bit
+        self.occupied = (self.occupied ^ start_bit) | end_bit
+
+        if piece == us * 6 + KING:
+            self.king[us] = end
+            if flags == KING_CASTLE or flags == QUEEN_CASTLE:
+                rook_from, rook_to = (start + 3, start + 1) if flags == KING_CASTLE else (start - 4, start - 1)
+                rook = us * 6 + ROOK
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                pieces[rook] ^= rook_bits
+                occupancy[us] ^= rook_bits
+                self.occupied ^= rook_bits
+                board[rook_from] = EMPTY
+                board[rook_to] = rook
+                key ^= ZOBRIST_PIECES[rook][rook_from] ^ ZOBRIST_PIECES[rook][rook_to]
+                psqt += PSQT[rook][rook_to] - PSQT[rook][rook_from]
+
+        castling = self.castling & CASTLING_MASK[start] & CASTLING_MASK[end]
+        if castling != self.castling:
+            key ^= ZOBRIST_CASTLING[self.castling] ^ ZOBRIST_CASTLING[castling]
+            self.castling = castling
+        if flags == DOUBLE_PUSH:
+            self.ep = (start + end) >> 1
+            if PAWN_ATTACKS[us][self.ep] & pieces[them * 6 + PAWN]:
+                key ^= ZOBRIST_EP_FILE[self.ep & 7]
+        else:
+            self.ep = -1
+        if moved == us * 6 + PAWN or flags & CAPTURE:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if us == BLACK:
+            self.fullmove += 1
+        self.side = them
+        self.key = key ^ ZOBRIST_SIDE
+        self.psqt = psqt
+
+    def unmake_move(self):
+        """Take back the last move played with make_move."""
+        (move, captured, self.castling, self.ep, self.halfmove, self.key,
+         self.psqt, self.phase, self.pawn_key) = self.history.pop()
+        start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+        them = self.side
+        us = them ^ 1
+        self.side = us
+        if us == BLACK:
+            self.fullmove -= 1
+        board = self.board
+        pieces = self.pieces
+        occupancy = self.occupancy
+        start_bit = 1 << start
+        end_bit = 1 << end
+
+        piece = board[end]
+        pieces[piece] ^= end_bit
+        if flags & PROMOTION:
+            piece = us * 6 + PAWN
+        pieces[piece] |= start_bit
+        board[start] = piece
+        board[end] = captured
+        occupancy[us] ^= start_bit | end_bit
+        self.occupied |= start_bit
+
+        if captured != EMPTY:
+            pieces[captured] |= end_bit
+            occupancy[them] |= end_bit
+        else:
+            self.occupied ^= end_bit
+            if flags == EP_CAPTURE:
+                victim = end - 8 if us == WHITE else end + 8
+                victim_bit = 1 << victim
+                pieces[them * 6 + PAWN] |= victim_bit
+                occupancy[them] |= victim_bit
+                self.occupied |= victim_bit
+                board[victim] = them * 6 + PAWN
+
+        if piece == us * 6 + KING:
+            self.king[us] = start
+            if flags == KING_CASTLE or flags == QUEEN_CASTLE:
+                rook_from, rook_to = (start + 3, start + 1) if flags == KING_CASTLE else (start - 4, start - 1)
+                rook = us * 6 + ROOK
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                pieces[rook] ^= rook_bits
+                occupancy[us] ^= rook_bits
+                self.occupied ^= rook_bits
+                board[rook_to] = EMPTY
+                board[rook_from] = rook
+
+    def make_null_move(self):
+        """Pass the turn (for null-move pruning). Undo with unmake_null_move."""
+        key = self.key
+        self.history.append((0, EMPTY, self.castling, self.ep, self.halfmove, key, self.psqt, self.phase,
+                             self.pawn_key))
+        us = self.side
+        if self.ep != -1 and PAWN_ATTACKS[us ^ 1][self.ep] & self.pieces[us * 6 + PAWN]:
+            key ^= ZOBRIST_EP_FILE[self.ep & 7]
+        self.ep = -1
+        # Positions before the null move can't repeat through it.
+        self.halfmove = 0
+        self.side = us ^ 1
+        self.key = key ^ ZOBRIST_SIDE
+
+    def unmake_null_move(self):
+        _, _, self.castling, self.ep, self.halfmove, self.key, _, _, _ = self.history.pop()
+        self.side ^= 1
+
+    def is_legal(self, move):
+        """True if the pseudo-legal `move` does not leave the mover's king in check."""
+        us = self.side
+        self.make_move(move)
+        legal = not self.is_attacked(self.king[us], us ^ 1)
+        self.unmake_move()
+        return legal
+
+    def generate_legal_moves(self):
+        return [move for move in self.generate_pseudo_legal_moves() if self.is_legal(move)]
+
+    def parse_uci(self, uci):
+        """Encoded legal move for a UCI string such as 'e2e4' or 'e7e8q'; ValueError if illegal."""
+        for move in self.generate_legal_moves():
+            if move_to_uci(move) == uci:
+                return move
+        raise ValueError(f"illegal move: {uci}")
+
+    # ---------------- SAN ----------------
+
+    def has_legal_move(self):
+        return any(self.is_legal(move) for move in self.generate_pseudo_legal_moves())
+
+    def san(self, move, legal=None):
+        """
+        Standard algebraic notation of the legal `move`, with + or #.
+        `legal` is an optional set of this position's legal moves; with
+        it, rivals for disambiguation are checked by set lookup instead
+        of make/unmake.
+        """
+        start, end, flags = move & 63, (move >> 6) & 63, move >> 12
+        piece_type = self.board[start] % 6
+        if flags == KING_CASTLE:
+            san = 'O-O'
+        elif flags == QUEEN_CASTLE:
+            san = 'O-O-O'
+        elif piece_type == PAWN:
+            san = square_name(end)
+            if flags & CAPTURE:
+                san = FILE_NAMES[start & 7] + 'x' + san
+            if flags & PROMOTION:
+                san += '=' + 'NBRQ'[flags & 3]
+        else:
+            san = 'PNBRQK'[piece_type]
+            if piece_type != KING:
+                san += self._disambiguation(move, piece_type, legal)
+            if flags & CAPTURE:
+                san += 'x'
+            san += square_name(end)
+
+        us = self.side
+        self.make_move(move)
+        if self.is_attacked(self.king[us ^ 1], us):
+            san += '+' if self.has_legal_move() else '#'
+        self.unmake_move()
         return san
-    # Other pieces
-    san = piece_type
-    # Find ambiguous moves
-    same_piece_moves = []
-    for r in range(8):
-        for c in range(8):
-            if (r, c) == (start_row, start_col):
+
+    def _disambiguation(self, move, piece_type, legal):
+        """File, rank, both or neither: whatever tells `move` apart from same-type pieces reaching its square."""
+        start, end = move & 63, (move >> 6) & 63
+        occupied = self.occupied
+        if piece_type == KNIGHT:
+            reach = KNIGHT_ATTACKS[end]
+        elif piece_type == BISHOP:
+            reach = BISHOP_TABLE[end][occupied & BISHOP_MASKS[end]]
+        elif piece_type == ROOK:
+            reach = ROOK_TABLE[end][occupied & ROOK_MASKS[end]]
+        else:
+            reach = BISHOP_TABLE[end][occupied & BISHOP_MASKS[end]] | ROOK_TABLE[end][occupied & ROOK_MASKS[end]]
+        rivals = reach & self.pieces[self.side * 6 + piece_type] & ~(1 << start)
+        same_file = same_rank = ambiguous = False
+        while rivals:
+            bit = rivals & -rivals
+            rivals ^= bit
+            rival = bit.bit_length() - 1
+            # A pinned rival can't really go there.
+            rival_move = rival | (move & ~63)
+            if not (rival_move in legal if legal is not None else self.is_legal(rival_move)):
                 continue
-            p = board[r][c]
-            if p.lower() == piece.lower() and ((active_color == 'w' and p.isupper()) or (active_color == 'b' and p.islower())):
-                temp_moves = []
-                if p.lower() == 'n':
-                    temp_moves = generate_knight_moves(board, r, c, active_color)
-                elif p.lower() == 'b':
-                    temp_moves = generate_bishop_moves(board, r, c, active_color)
-                elif p.lower() == 'r':
-                    temp_moves = generate_rook_moves(board, r, c, active_color)
-                elif p.lower() == 'q':
-                    temp_moves = generate_queen_moves(board, r, c, active_color)
-                elif p.lower() == 'k':
-                    temp_moves = generate_king_moves(board, r, c, active_color, castling_rights)
-                for m in temp_moves:
-                    if m[1][0] == end_row and m[1][1] == end_col:
-                        same_piece_moves.append((r, c))
-                        break
-    # Add disambiguation
-    if same_piece_moves:
-        same_file = any(c == start_col for (r, c) in same_piece_moves)
-        same_rank = any(r == start_row for (r, c) in same_piece_moves)
-        if same_file or same_rank:
-            if same_file and same_rank:
-                san += f"{chr(start_col + ord('a'))}{8 - start_row}"
-            elif same_file:
-                san += f"{8 - start_row}"
-            else:
-                san += f"{chr(start_col + ord('a'))}"
+            ambiguous = True
+            same_file |= rival & 7 == start & 7
+            same_rank |= rival >> 3 == start >> 3
+        if not ambiguous:
+            return ''
+        if not same_file:
+            return FILE_NAMES[start & 7]
+        if not same_rank:
+            return str((start >> 3) + 1)
+        return square_name(start)
+
+    def san_moves(self, moves=None):
+        """SAN of `moves` (default: every legal move), sharing one legal move set across them."""
+        legal = self.generate_legal_moves()
+        legal_set = set(legal)
+        return [self.san(move, legal_set) for move in (legal if moves is None else moves)]
+
+    def parse_san(self, san):
+        """Encoded legal move for a SAN string such as 'Nbd7' or 'exd8=Q+'; ValueError if illegal or ambiguous."""
+        text = san.rstrip('+#!?')
+        if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+            wanted = KING_CASTLE if len(text) == 3 else QUEEN_CASTLE
+            matches = [move for move in self.generate_pseudo_legal_moves() if move >> 12 == wanted]
         else:
-            san += f"{chr(start_col + ord('a'))}"
-    # Capture
-    if board[end_row][end_col] != '.':
-        san += 'x'
-    # Destination
-    san += f"{chr(end_col + ord('a'))}{8 - end_row}"
-    # Promotion
-    if promo:
-        san += f'={promo.upper()}'
-    return san
+            match = SAN_PATTERN.match(text)
+            if not match:
+                raise ValueError(f"bad SAN: {san}")
+            letter, file, rank, square, promo = match.groups()
+            piece = self.side * 6 + ('PNBRQK'.index(letter) if letter else PAWN)
+            end = parse_square(square)
+            promo_bits = PROMOTION | 'NBRQ'.index(promo) if promo else 0
+            matches = []
+            for move in self.generate_pseudo_legal_moves():
+                start, flags = move & 63, move >> 12
+                if ((move >> 6) & 63 != end or self.board[start] != piece
+                        or (file and FILE_NAMES[start & 7] != file)
+                        or (rank and str((start >> 3) + 1) != rank)
+                        or (flags & (PROMOTION | 3) if flags & PROMOTION else 0) != promo_bits):
+                    continue
+                matches.append(move)
+        matches = [move for move in matches if self.is_legal(move)]
+        if len(matches) != 1:
+            raise ValueError(f"{'illegal' if not matches else 'ambiguous'} move: {san}")
+        return matches[0]
+
+
+def generate_legal_moves(fen):
+    return [move_to_tuple(move) for move in Position.from_fen(fen).generate_legal_moves()]
+
 
 def get_legal_moves(fen):
-    legal_moves = generate_legal_moves(fen)
-    board, active_color, _, _ = parse_fen(fen)
-    san_moves = []
-    for move in legal_moves:
-        san = move_to_san(move, board, active_color)
-        san_moves.append(san)
-    return sorted(san_moves)
-
-# Example usage:
-fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
-print(get_legal_moves(fen))
\ No newline at end of file
+    """Sorted SAN of every legal move in `fen`."""
+    return sorted(Position.from_fen(fen).san_moves())
+
+
+if __name__ == "__main__":
+    # Example usage:
+    fen = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    print(get_legal_moves(fen))
@@ -0,0 +1,192 @@
+"""
+Fixed-size transposition table keyed by Position.key (Zobrist).
+
+The table is one preallocated array('Q') so its memory is fixed by
+the size given in MB, no matter how long a session runs. Each bucket
+holds two slots:
+
+    slot 0  depth-preferred: only replaced by an equal or deeper
+            search, or by anything once the entry is from an older search
+    slot 1  always-replace: takes whatever slot 0 turned down
+
+A slot is two 64-bit words, (key ^ data, data). The key is never
+stored on its own; an entry only matches if the XOR of the two words
+gives back the probing key. This lets a torn write be detected as a
+miss, which is what allows SharedTranspositionTable to be written by
+several processes at once without any locking.
+
+data bits:  0-15 move | 16-31 score + 32768 | 32-39 depth |
+            40-41 bound | 42-47 search generation
+"""
+
+from array import array
+from multiprocessing import shared_memory
+from typing import NamedTuple, Optional
+
+BOUND_EXACT, BOUND_LOWER, BOUND_UPPER = 1, 2, 3  # 0 marks an empty slot
+
+BUCKET_WORDS = 4  # two slots of (key ^ data, data)
+BUCKET_BYTES = BUCKET_WORDS * 8
+
+# Buckets sampled for hashfull(), like the UCI "hashfull" permille
+HASHFULL_SAMPLE = 500
+
+
+class Entry(NamedTuple):
+    move: int
+    score: int
+    depth: int
+    bound: int
+
+
+def pack(move: int, score: int, depth: int, bound: int, generation: int) -> int:
+    return (move | (score + 32768) << 16 | min(max(depth, 0), 255) << 32
+            | bound << 40 | generation << 42)
+
+
+def unpack(data: int) -> Entry:
+    return Entry(data & 0xFFFF, ((data >> 16) & 0xFFFF) - 32768, (data >> 32) & 0xFF, (data >> 40) & 3)
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16):
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES)
+        self.table = array('Q', bytes(self.buckets * BUCKET_BYTES))
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self) -> None:
+        self.table = array('Q', bytes(self.buckets * BUCKET_BYTES))
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def new_search(self) -> None:
+        """Age the table: entries from earlier searches become replaceable."""
+        self.generation = (self.generation + 1) & 63
+
+    def probe(self, key: int) -> Optional[Entry]:
+        self.probes += 1
+        table = self.table
+        i = (key % self.buckets) * BUCKET_WORDS
+        data = table[i + 1]
+        if data and table[i] ^ data == key:
+            self.hits += 1
+            return unpack(data)
+        data = table[i + 3]
+        if data and table[i + 2] ^ data == key:
+            self.hits += 1
+            return unpack(data)
+        return None
+
+    def store(self, key: int, move: int, score: int, depth: int, bound: int) -> None:
+        self.stores += 1
+        table = self.table
+        i = (key % self.buckets) * BUCKET_WORDS
+        data = pack(move, score, depth, bound, self.generation)
+        deep = table[i + 1]
+        if (not deep or table[i] ^ deep == key or depth >= (deep >> 32) & 0xFF
+                or (deep >> 42) != self.generation):
+            # Keep the old best move if this search didn't find one.
+            if not move and deep and table[i] ^ deep == key:
+                data |= deep & 0xFFFF
+            table[i] = key ^ data
+            table[i + 1] = data
+        else:
+            table[i + 2] = key ^ data
+            table[i + 3] = data
+
+    def hashfull(self) -> int:
+        """Permille of sampled slots holding an entry from the current search."""
+        table = self.table
+        sample = min(HASHFULL_SAMPLE, self.buckets)
+        used = 0
+        for word in range(1, sample * BUCKET_WORDS, 2):
+            data = table[word]
+            if data and (data >> 42) == self.generation:
+                used += 1
+        return used * 1000 // (sample * 2)
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    The same table laid over a multiprocessing.shared_memory block, so
+    the processes of a parallel search all read and write one table.
+    Create it once with name=None, then attach from other processes
+    with the creator's .name and the same size.
+    """
+
+    def __init__(self, size_mb: float = 16, name: Optional[str] = None):
+        self.buckets = max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.buckets * BUCKET_BYTES)
+            self.shm.buf[:] = bytes(self.buckets * BUCKET_BYTES)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self.table = self.shm.buf.cast('Q')
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+
+    def clear(self) -> None:
+        self.shm.buf[:] = bytes(self.buckets * BUCKET_BYTES)
+        self.generation = 0
+        self.probes = self.hits = self.stores = 0
+
+    def close(self) -> None:
+        """Detach; the creating process also frees the block."""
+        self.table.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class PawnHashTable:
+    """
+    Cache for the evaluation's pawn-structure term, keyed by
+    Position.pawn_key. Pawns move rarely, so most lookups in a search
+    hit. One entry per index (always replace): the key, the packed
+    S(mg, eg) score and the bitboard of passed pawns, 24 bytes in all.
+    """
+
+    ENTRY_BYTES = 24
+
+    def __init__(self, size_kb: float = 256):
+        self.size = max(1, int(size_kb * 1024) // self.ENTRY_BYTES)
+        self.keys = array('Q', bytes(self.size * 8))
+        self.scores = array('q', bytes(self.size * 8))
+        self.passed = array('Q', bytes(self.size * 8))
+        self.probes = 0
+        self.hits = 0
+
+    def clear(self) -> None:
+        # Scores too: a pawnless position has key 0 and matches an empty slot.
+        self.keys = array('Q', bytes(self.size * 8))
+        self.scores = array('q', bytes(self.size * 8))
+        self.passed = array('Q', bytes(self.size * 8))
+        self.probes = self.hits = 0
+
+    def probe(self, pawn_key: int) -> Optional[tuple[int, int]]:
+        """(score, passed pawns) stored for these pawns, or None."""
+        self.probes += 1
+        i = pawn_key % self.size
+        if self.keys[i] == pawn_key:
+            self.hits += 1
+            return self.scores[i], self.passed[i]
+        return None
+
+    def store(self, pawn_key: int, score: int, passed: int) -> None:
+        i = pawn_key % self.size
+        self.keys[i] = pawn_key
+        self.scores[i] = score
+        self.passed[i] = passed
+
+    def hit_rate(self) -> float:
+        return self.hits / self.probes if self.probes else 0.0
@@ -0,0 +1,195 @@
+"""
+Texel tuning of the material and piece-square values in psqt.py.
+
+Takes a file of positions labelled with the result of the game they
+came from and adjusts the weights so the evaluation predicts those
+results as well as possible: the loss is the mean squared error
+between the result (1, 0.5, 0) and sigmoid(K * eval), with K first
+fitted to the starting weights.
+
+The dataset is read once into arrays: for every piece on every board
+the index of its table entry and its sign (+1 White, -1 Black), the
+game phase, and the terms that are not being tuned (pawn structure,
+mobility, king safety) as fixed offsets. Every epoch after that is a
+handful of NumPy gathers and bincounts, no Python loop over positions.
+
+Accepted lines, one position each:
+
+    <fen> [1.0]                 result in brackets, White's score
+    <fen> "1-0";                EPD style, also 0-1 and 1/2-1/2
+
+>>> python tune.py positions.epd --epochs 500 --output weights.json
+"""
+
+import argparse
+import math
+import re
+import sys
+import time
+
+import numpy as np
+
+import psqt
+from batch_eval import fens_to_boards
+from evaluate import TEMPO, pawn_structure, passed_pawns, piece_activity
+from psqt import PHASE_WEIGHTS, PHASE_MAX, mg_eg
+from temp import Position, WHITE
+
+_RESULT_TOKEN = re.compile(r'\b(1-0|0-1|1/2-1/2)\b|\[([01](?:\.\d*)?)\]')
+_RESULTS = {"1-0": 1.0, "0-1": 0.0, "1/2-1/2": 0.5}
+
+TABLE_ENTRIES = 6 * 64
+
+
+def parse_line(line: str) -> tuple[str, float]:
+    """(fen, White's result) for one dataset line; ValueError if there is no result."""
+    match = _RESULT_TOKEN.search(line)
+    if not match:
+        raise ValueError(f"no game result in line: {line!r}")
+    result = _RESULTS[match.group(1)] if match.group(1) else float(match.group(2))
+    # Board, side, castling, en passant, then the clocks if present;
+    # anything after that (EPD opcodes such as c9) is not FEN.
+    fields = line[:match.start()].split()
+    fen = fields[:4] + [field for field in fields[4:6] if field.isdigit()]
+    return ' '.join(fen), result
+
+
+def load_dataset(path: str) -> tuple[list, np.ndarray]:
+    fens, results = [], []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                fen, result = parse_line(line)
+                fens.append(fen)
+                results.append(result)
+    return fens, np.array(results)
+
+
+class Dataset:
+    """Positions turned into the arrays the tuner needs, computed once."""
+
+    def __init__(self, fens, results: np.ndarray):
+        boards, sides = fens_to_boards(fens)
+        self.results = results
+        self.count = len(fens)
+        rows, squares = np.nonzero(boards >= 0)
+        pieces = boards[rows, squares].astype(np.int64)
+        white = pieces < 6
+        self.rows = rows
+        self.types = pieces % 6
+        # Tables are written a8 first: White's square sq is entry sq ^ 56.
+        self.entries = self.types * 64 + np.where(white, squares ^ 56, squares)
+        self.signs = np.where(white, 1.0, -1.0)
+        phase = np.bincount(rows, weights=np.array(PHASE_WEIGHTS * 2)[pieces], minlength=self.count)
+        self.phase = np.minimum(phase, PHASE_MAX) / PHASE_MAX
+
+        # Terms outside the tables: scored once with the current evaluator.
+        self.offset_mg = np.empty(self.count)
+        self.offset_eg = np.empty(self.count)
+        for i, fen in enumerate(fens):
+            pos = Position.from_fen(fen)
+            pawns, passed = pawn_structure(pos)
+            self.offset_mg[i], self.offset_eg[i] = mg_eg(pawns + passed_pawns(pos, passed) + piece_activity(pos))
+        self.offset_tempo = np.where(sides == WHITE, TEMPO, -TEMPO)
+
+    def scores(self, mg_tables, eg_tables, mg_values, eg_values) -> np.ndarray:
+        """White's evaluation of every position for the given weights."""
+        mg = np.bincount(self.rows, weights=self.signs * (mg_tables[self.entries] + mg_values[self.types]),
+                         minlength=self.count) + self.offset_mg
+        eg = np.bincount(self.rows, weights=self.signs * (eg_tables[self.entries] + eg_values[self.types]),
+                         minlength=self.count) + self.offset_eg
+        return mg * self.phase + eg * (1 - self.phase) + self.offset_tempo
+
+
+def _sigmoid(scores: np.ndarray, k: float) -> np.ndarray:
+    return 1.0 / (1.0 + np.power(10.0, -k * scores / 400.0))
+
+
+def fit_k(scores: np.ndarray, results: np.ndarray) -> float:
+    """Scaling constant K minimising the loss of the untuned evaluation (ternary search)."""
+    low, high = 0.05, 5.0
+    for _ in range(60):
+        a, b = low + (high - low) / 3, high - (high - low) / 3
+        if np.mean((results - _sigmoid(scores, a)) ** 2) < np.mean((results - _sigmoid(scores, b)) ** 2):
+            high = b
+        else:
+            low = a
+    return (low + high) / 2
+
+
+def tune(data: Dataset, epochs: int = 500, rate: float = 2.0, log_every: int = 50) -> dict:
+    """Adam over the tables and piece values; returns the tuned weights as float arrays."""
+    params = [
+        np.array([value for table in psqt.MG_TABLES for value in table], dtype=float),
+        np.array([value for table in psqt.EG_TABLES for value in table], dtype=float),
+        np.array(psqt.MG_VALUES, dtype=float),
+        np.array(psqt.EG_VALUES, dtype=float),
+    ]
+    k = fit_k(data.scores(*params), data.results)
+    print(f"K = {k:.3f}")
+    moments = [np.zeros_like(p) for p in params]
+    squares = [np.zeros_like(p) for p in params]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    scale = k * math.log(10) / 400
+    for epoch in range(1, epochs + 1):
+        predicted = _sigmoid(data.scores(*params), k)
+        error = data.results - predicted
+        # d loss / d score for every position, then split by phase
+        d_score = -2 * error * predicted * (1 - predicted) * scale / data.count
+        d_mg = (d_score * data.phase)[data.rows] * data.signs
+        d_eg = (d_score * (1 - data.phase))[data.rows] * data.signs
+        grads = [
+            np.bincount(data.entries, weights=d_mg, minlength=TABLE_ENTRIES),
+            np.bincount(data.entries, weights=d_eg, minlength=TABLE_ENTRIES),
+            np.bincount(data.types, weights=d_mg, minlength=6),
+            np.bincount(data.types, weights=d_eg, minlength=6),
+        ]
+        # The kings' value is fixed at 0; it would only shift every score.
+        grads[2][5] = grads[3][5] = 0.0
+        for i, grad in enumerate(grads):
+            moments[i] = beta1 * moments[i] + (1 - beta1) * grad
+            squares[i] = beta2 * squares[i] + (1 - beta2) * grad * grad
+            step = moments[i] / (1 - beta1 ** epoch) / (np.sqrt(squares[i] / (1 - beta2 ** epoch)) + eps)
+            params[i] -= rate * step
+        if log_every and (epoch % log_every == 0 or epoch == 1):
+            print(f"epoch {epoch:5d}  loss {np.mean(error ** 2):.6f}")
+    mg_tables, eg_tables, mg_values, eg_values = params
+    return {
+        "mg_tables": mg_tables.reshape(6, 64),
+        "eg_tables": eg_tables.reshape(6, 64),
+        "mg_values": mg_values,
+        "eg_values": eg_values,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Texel-tune the piece-square tables")
+    parser.add_argument("dataset", help="positions with game results, one per line")
+    parser.add_argument("--epochs", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=2.0, help="Adam step size, in centipawns")
+    parser.add_argument("--output", default=psqt.WEIGHTS_FILE,
+                        help="weights file to write (default: the one psqt.py loads)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    fens, results = load_dataset(args.dataset)
+    data = Dataset(fens, results)
+    print(f"{data.count} positions loaded in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    weights = tune(data, args.epochs, args.rate)
+    print(f"tuned in {time.perf_counter() - start:.1f}s")
+
+    psqt.MG_VALUES[:] = [int(round(v)) for v in weights["mg_values"]]
+    psqt.EG_VALUES[:] = [int(round(v)) for v in weights["eg_values"]]
+    for piece_type in range(6):
+        psqt.MG_TABLES[piece_type][:] = [int(round(v)) for v in weights["mg_tables"][piece_type]]
+        psqt.EG_TABLES[piece_type][:] = [int(round(v)) for v in weights["eg_tables"][piece_type]]
+    psqt.save_weights(args.output)
+    print(f"wrote {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+"""
+UCI front end for the engine: speaks the Universal Chess Interface on
+stdin/stdout, so the engine runs under GUIs, tournament managers
+(cutechess-cli, fastchess) and the usual benchmarking tools.
+
+>>> python uci.py
+
+Supported commands: uci, isready, setoption (Hash, Threads, EvalFile,
+Ponder), ucinewgame, position, go (depth, movetime, wtime, btime,
+winc, binc, movestogo, nodes, mate, infinite, ponder), stop, ponderhit,
+quit.
+
+The search runs on a background thread, so stop, ponderhit and
+isready are answered while it is thinking. Every completed depth is
+reported as an info line with score, nodes, nps, hashfull and pv; with
+Threads above 1, nodes and nps count the helper processes too.
+"""
+
+import sys
+import threading
+import time
+from typing import Optional
+
+from engine import Engine, SearchResult, MATE, MAX_PLY
+from nnue import NNUEEvaluator
+from smp import ParallelEngine
+from temp import Position, WHITE, move_to_uci
+
+NAME = "TermiChess"
+AUTHOR = "TermiChess contributors"
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+DEFAULT_HASH = 16
+MAX_HASH = 4096
+MAX_THREADS = 256
+
+# Time management: expect this many more moves when the GUI doesn't say,
+# and keep this much on the clock for communication lag.
+MOVES_TO_GO = 30
+MOVE_OVERHEAD = 0.05
+
+
+def format_score(score: int) -> str:
+    if abs(score) >= MATE - MAX_PLY:
+        plies = MATE - abs(score)
+        moves = (plies + 1) // 2
+        return f"mate {moves if score > 0 else -moves}"
+    return f"cp {score}"
+
+
+def allotted_time(side: int, args: dict) -> Optional[float]:
+    """Seconds to spend on this move from the go parameters, or None for no limit."""
+    if "movetime" in args:
+        return max(args["movetime"] - MOVE_OVERHEAD * 1000, 1) / 1000
+    left = args.get("wtime" if side == WHITE else "btime")
+    if left is None:
+        return None
+    increment = args.get("winc" if side == WHITE else "binc", 0)
+    moves_to_go = args.get("movestogo", MOVES_TO_GO)
+    budget = left / moves_to_go + increment * 3 / 4
+    return max(min(budget, left - MOVE_OVERHEAD * 1000), 1) / 1000
+
+
+class UCI:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH
+        self.threads = 1
+        self.eval_file = ""
+        self.engine = None
+        self.position = Position.from_fen(START_FEN)
+        self.thread = None
+        # Set when an infinite or ponder search may print its bestmove
+        self.release = threading.Event()
+        self.pending_movetime = None
+
+    def send(self, line: str) -> None:
+        with self.lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def _engine(self):
+        if self.engine is None:
+            if self.threads > 1:
+                self.engine = ParallelEngine(self.threads, self.hash_mb, self.eval_file or None)
+            else:
+                evaluator = NNUEEvaluator.from_file(self.eval_file) if self.eval_file else None
+                self.engine = Engine(self.hash_mb, evaluator=evaluator)
+        return self.engine
+
+    def _discard_engine(self) -> None:
+        if isinstance(self.engine, ParallelEngine):
+            self.engine.close()
+        self.engine = None
+
+    # ---------------- commands ----------------
+
+    def handle(self, line: str) -> bool:
+        """Process one input line; False once the GUI sent quit."""
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {NAME}")
+            self.send(f"id author {AUTHOR}")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH} min 1 max {MAX_HASH}")
+            self.send(f"option name Threads type spin default 1 min 1 max {MAX_THREADS}")
+            self.send("option name EvalFile type string default <empty>")
+            self.send("option name Ponder type check default false")
+            self.send("uciok")
+        elif command == "isready":
+            self._engine()
+            self.send("readyok")
+        elif command == "setoption":
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait()
+            if self.engine is not None:
+                self.engine.tt.clear()
+        elif command == "position":
+            self.set_position(args)
+        elif command == "go":
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop()
+            self._discard_engine()
+            return False
+        else:
+            self.send(f"info string unknown command: {line.strip()}")
+        return True
+
+    def set_option(self, args: list) -> None:
+        # setoption name <id> [value <x>]; names may contain spaces
+        if "name" not in args:
+            return
+        rest = args[args.index("name") + 1:]
+        if "value" in rest:
+            name = " ".join(rest[:rest.index("value")]).lower()
+            value = " ".join(rest[rest.index("value") + 1:])
+        else:
+            name, value = " ".join(rest).lower(), ""
+        self.wait()
+        try:
+            if name == "hash":
+                self.hash_mb = min(max(int(value), 1), MAX_HASH)
+            elif name == "threads":
+                self.threads = min(max(int(value), 1), MAX_THREADS)
+            elif name == "evalfile":
+                self.eval_file = "" if value in ("", "<empty>") else value
+            elif name == "ponder":
+                return  # pondering needs nothing set up in advance
+            else:
+                self.send(f"info string unknown option: {name}")
+                return
+        except ValueError:
+            self.send(f"info string bad value for {name}: {value}")
+            return
+        self._discard_engine()
+
+    def set_position(self, args: list) -> None:
+        if not args:
+            return
+        if args[0] == "startpos":
+            fen, rest = START_FEN, args[1:]
+        elif args[0] == "fen":
+            end = args.index("moves") if "moves" in args else len(args)
+            fen, rest = " ".join(args[1:end]), args[end:]
+        else:
+            return
+        try:
+            position = Position.from_fen(fen)
+            if rest and rest[0] == "moves":
+                for uci in rest[1:]:
+                    position.make_move(position.parse_uci(uci))
+        except (ValueError, IndexError) as error:
+            self.send(f"info string bad position: {error}")
+            return
+        self.position = position
+
+    def go(self, args: list) -> None:
+        self.wait()
+        params = {}
+        infinite = ponder = False
+        i = 0
+        while i < len(args):
+            token = args[i]
+            if token == "infinite":
+                infinite = True
+            elif token == "ponder":
+                ponder = True
+            elif token in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes", "mate"):
+                if i + 1 < len(args) and args[i + 1].lstrip("-").isdigit():
+                    params[token] = int(args[i + 1])
+                    i += 1
+            i += 1
+
+        depth = min(params.get("depth", MAX_PLY), MAX_PLY)
+        if params.get("mate", 0) > 0:
+            # Seeing a mate in n moves takes 2n plies, the last one
+            # finding no reply; the search stops as soon as it has one.
+            depth = min(depth, 2 * params["mate"])
+        nodes = params.get("nodes") if params.get("nodes", 0) > 0 else None
+        movetime = None if infinite else allotted_time(self.position.side, params)
+        if ponder:
+            # Think on the opponent's time with no limit; the clock
+            # starts on ponderhit.
+            self.pending_movetime, movetime = movetime, None
+        self.release.clear()
+        if not (infinite or ponder):
+            self.release.set()
+        engine = self._engine()
+        self.thread = threading.Thread(target=self._search,
+                                       args=(engine, self.position.copy(), depth, movetime, nodes), daemon=True)
+        self.thread.start()
+
+    def _search(self, engine, pos: Position, depth: int, movetime: Optional[float],
+                nodes: Optional[int]) -> None:
+        start = time.perf_counter()
+
+        def report(result: SearchResult) -> None:
+            elapsed = max(time.perf_counter() - start, 1e-6)
+            nps = int(result.nodes / elapsed)
+            pv = " ".join(move_to_uci(move) for move in result.pv)
+            self.send(f"info depth {result.depth} score {format_score(result.score)} nodes {result.nodes} "
+                      f"nps {nps} time {int(elapsed * 1000)} hashfull {engine.tt.hashfull()} pv {pv}")
+
+        result = engine.search(pos, depth, movetime, report, nodes)
+        # The hand-written evaluation caches pawn structure; NNUE has no such table.
+        main = engine.engine if isinstance(engine, ParallelEngine) else engine
+        pawn_table = getattr(main.evaluator, "pawn_table", None)
+        if pawn_table is not None:
+            self.send(f"info string pawn hash hit rate {pawn_table.hit_rate() * 100:.1f}% "
+                      f"of {pawn_table.probes} probes")
+        # An infinite or ponder search may end early (mate found, depth
+        # reached) but must not answer before stop or ponderhit.
+        self.release.wait()
+        if result.move is None:
+            self.send("bestmove 0000")
+        elif len(result.pv) > 1:
+            self.send(f"bestmove {move_to_uci(result.move)} ponder {move_to_uci(result.pv[1])}")
+        else:
+            self.send(f"bestmove {move_to_uci(result.move)}")
+
+    def stop(self) -> None:
+        if self.thread is not None:
+            self.release.set()
+            # Repeat the request: a search that was only just starting
+            # clears the stop flag when it begins.
+            while self.thread.is_alive():
+                self.engine.stop()
+                self.thread.join(0.05)
+        self.thread = None
+
+    def ponderhit(self) -> None:
+        """The opponent played the predicted move: the ponder search becomes a normal one."""
+        if self.thread is not None and self.thread.is_alive():
+            self.engine.set_movetime(self.pending_movetime)
+            self.release.set()
+
+    def wait(self) -> None:
+        """Let a running search finish by itself (stopping it if it would never end)."""
+        if self.thread is not None and self.thread.is_alive():
+            if not self.release.is_set():
+                self.stop()
+            self.thread.join()
+        self.thread = None
+
+
+def main() -> int:
+    uci = UCI()
+    for line in sys.stdin:
+        if not uci.handle(line):
+            break
+    else:
+        uci.stop()
+        uci._discard_engine()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())